@@ -0,0 +1,269 @@
+"""
+JSON API over the dashboard's metrics, charts and forecasts, for tooling outside the UI.
+
+One incident dataset is loaded per server process and refreshed in the background.
+Responses are cached per dataset version and carry it as their ETag, so a client
+sending If-None-Match gets a 304 until the data (or the forecasting model) changes.
+
+    python apiServer.py --data-dir exports/ --port 8600
+
+    GET /apps
+    GET /metrics/{app_id}?range=1+Week
+    GET /fleet?range=1+Month
+    GET /charts/{trend|source|severity|severity-monthly}/{app_id}?range=3+Months&start=2024-01-01&end=2024-03-31
+    GET /forecast?start=2025-01-01&end=2025-01-31[&app=B6OV&source=Auto+Bridge&category=Operational+Issues]
+"""
+import argparse
+import asyncio
+import contextlib
+import hashlib
+import json
+import logging
+import math
+
+import numpy as np
+import pandas as pd
+import plotly.io as pio
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+from charts import generate_graph, generate_pie_chart, generate_severity_bar_chart, generate_source_graph
+from dataLoader import IncidentStore
+from forecastWorker import FORECASTS
+from forecastingModel import MODEL_FILE, model_file_version
+from incidentCube import incident_cube
+from incidentIndex import incident_index
+from lruCache import LRUCache
+from metricsFunc import compute_fleet_metrics, compute_metrics_bundle, get_baseline_avg_incidents
+from modelStore import STORE
+from periodWindow import resolve_window
+
+logger = logging.getLogger(__name__)
+
+# Seconds between two checks of the data directory for new or changed exports
+REFRESH_SECONDS = 30
+
+CHARTS = {
+    'trend': generate_graph,
+    'source': generate_source_graph,
+    'severity': generate_pie_chart,
+    'severity-monthly': generate_severity_bar_chart,
+}
+
+
+class ApiError(Exception):
+    def __init__(self, status_code, detail):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+    def response(self):
+        return JSONResponse({'detail': self.detail}, status_code=self.status_code)
+
+
+def _jsonable(value):
+    # NumPy scalars become Python numbers, NaN and infinities become null
+    if isinstance(value, dict):
+        return {str(key): _jsonable(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(item) for item in value]
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+def _json_bytes(value):
+    return json.dumps(_jsonable(value), separators=(',', ':')).encode()
+
+
+class Dataset:
+    """
+    The incident frame of one data directory with its per-version constants.
+
+    refresh() swaps in a new version atomically: requests already running keep
+    reading the frame they started with.
+    """
+
+    def __init__(self, data_dir=''):
+        self.store = IncidentStore(data_dir)
+        self.state = None  # (version, df, app displays, baseline)
+
+    def refresh(self):
+        df = self.store.refresh()
+        if self.state is None or self.state[0] != self.store.version:
+            incident_cube(df)
+            self.state = (self.store.version, df, incident_index(df).app_labels('app_display'),
+                          get_baseline_avg_incidents(df))
+        return self.state
+
+
+def create_app(data_dir=''):
+    dataset = Dataset(data_dir)
+    responses = LRUCache(maxsize=1024)
+
+    async def cached_json(request, version, build):
+        """
+        Serve build()'s JSON body for this request, cached per version and tagged with it.
+
+        The request is validated before, so an invalid one never gets a 304.
+        """
+        etag = '"' + hashlib.sha1(repr(version).encode()).hexdigest()[:20] + '"'
+        headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+        if request.headers.get('if-none-match') == etag:
+            return Response(status_code=304, headers=headers)
+
+        key = (version, request.url.path, tuple(sorted(request.query_params.multi_items())))
+        try:
+            # Built on a worker thread: the metric and chart computations are blocking
+            body = await run_in_threadpool(responses.get_or_create, key, build)
+        except ApiError as error:
+            return error.response()
+        return Response(body, media_type='application/json', headers=headers)
+
+    def selection(request, app_displays):
+        """
+        The validated appId and range of the request.
+        """
+        app_id = request.path_params.get('app_id')
+        if app_id is not None and app_id not in app_displays.index:
+            raise ApiError(404, f"Unknown appId: {app_id}")
+        range_key = request.query_params.get('range')
+        if range_key is not None:
+            try:
+                resolve_window(pd.Timestamp('today'), range_key)
+            except ValueError as error:
+                raise ApiError(400, str(error))
+        return app_id, range_key
+
+    # Every handler reads dataset.state once: a background refresh swapping it meanwhile
+    # must not get the new version's data cached and tagged under the old version
+
+    async def apps(request):
+        version, _, app_displays, _ = dataset.state
+        return await cached_json(request, version, lambda: _json_bytes(
+            [{'appId': app_id, 'app_display': display} for app_id, display in app_displays.items()]))
+
+    async def metrics(request):
+        version, df, app_displays, baseline = dataset.state
+        try:
+            app_id, range_key = selection(request, app_displays)
+        except ApiError as error:
+            return error.response()
+
+        def build():
+            bundle = compute_metrics_bundle(app_id, df, range_key, baseline)
+            return _json_bytes(dict(appId=app_id, app_display=app_displays[app_id], range=range_key, **bundle))
+
+        return await cached_json(request, version, build)
+
+    async def fleet(request):
+        version, df, app_displays, _ = dataset.state
+        try:
+            _, range_key = selection(request, app_displays)
+        except ApiError as error:
+            return error.response()
+        return await cached_json(request, version, lambda: _json_bytes(
+            compute_fleet_metrics(df, range_key).to_dict(orient='records')))
+
+    async def chart(request):
+        version, df, app_displays, _ = dataset.state
+        generate = CHARTS.get(request.path_params['kind'])
+        if generate is None:
+            return JSONResponse({'detail': f"Unknown chart; one of {', '.join(CHARTS)}"}, status_code=404)
+        try:
+            app_id, range_key = selection(request, app_displays)
+            start, end = request.query_params.get('start'), request.query_params.get('end')
+            try:
+                start, end = (pd.Timestamp(start).date(), pd.Timestamp(end).date()) if start and end else (None, None)
+            except ValueError as error:
+                raise ApiError(400, f"Invalid date: {error}")
+        except ApiError as error:
+            return error.response()
+
+        def build():
+            fig = generate(app_id, range_key or '3 Months', df, start, end)
+            if fig is None:
+                raise ApiError(404, "No data available for the selected range.")
+            return pio.to_json(fig, validate=False).encode()
+
+        return await cached_json(request, version, build)
+
+    async def forecast(request):
+        params = request.query_params
+        try:
+            start, end = pd.Timestamp(params['start']).date(), pd.Timestamp(params['end']).date()
+        except (KeyError, ValueError):
+            return JSONResponse({'detail': "start and end dates are required"}, status_code=400)
+        if end < start:
+            return JSONResponse({'detail': "end is before start"}, status_code=400)
+
+        model_file = MODEL_FILE
+        if 'app' in params:
+            key = (params['app'], params.get('source') or None, params.get('category') or None)
+            if key not in STORE.series():
+                return JSONResponse({'detail': f"No model for series {key}"}, status_code=404)
+            model_file = STORE.model_path(key)
+
+        try:
+            version = (model_file, model_file_version(model_file))
+        except OSError:
+            return JSONResponse({'detail': "The forecasting model is not available"}, status_code=503)
+        etag = '"' + hashlib.sha1(repr((version, start, end)).encode()).hexdigest()[:20] + '"'
+        headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+        if request.headers.get('if-none-match') == etag:
+            return Response(status_code=304, headers=headers)
+
+        try:
+            # Shared with the dashboard's forecast jobs: concurrent identical requests run once
+            incident_dates = await asyncio.wrap_future(FORECASTS.request(start, end, model_file))
+        except (KeyError, ValueError, IndexError) as error:
+            # The model rejects the window, e.g. dates before its training data
+            return JSONResponse({'detail': f"Cannot forecast this window: {error}"}, status_code=400)
+        except Exception as error:
+            return JSONResponse({'detail': f"Forecast failed: {error}"}, status_code=503)
+        return Response(_json_bytes({'start': str(start), 'end': str(end), 'incident_dates': incident_dates}),
+                        media_type='application/json', headers=headers)
+
+    async def refresh_periodically():
+        while True:
+            await asyncio.sleep(REFRESH_SECONDS)
+            try:
+                await run_in_threadpool(dataset.refresh)
+            except Exception:
+                # e.g. an export still being copied: keep serving the current version and retry
+                logger.exception("Refreshing the incident dataset failed")
+
+    @contextlib.asynccontextmanager
+    async def lifespan(app):
+        await run_in_threadpool(dataset.refresh)
+        task = asyncio.create_task(refresh_periodically())
+        yield
+        task.cancel()
+
+    return Starlette(routes=[
+        Route('/apps', apps),
+        Route('/metrics/{app_id}', metrics),
+        Route('/fleet', fleet),
+        Route('/charts/{kind}/{app_id}', chart),
+        Route('/forecast', forecast),
+    ], lifespan=lifespan)
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--data-dir', default='', help="directory of the JSON exports (default: current)")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8600)
+    args = parser.parse_args()
+
+    uvicorn.run(create_app(args.data_dir), host=args.host, port=args.port, log_level='warning')
+
+
+if __name__ == '__main__':
+    main()
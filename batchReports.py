@@ -0,0 +1,105 @@
+"""
+Render the metrics PDF report of every app (or of the given apps) without the UI.
+
+The incident data is loaded once in the parent process. Workers are forked from it and
+share the loaded frame and its rollup; on platforms without fork each worker loads the
+dataset from the store's Parquet cache instead of re-parsing the JSON exports.
+
+    python batchReports.py --range "1 Week" --out reports/
+    python batchReports.py --apps B6OV A1B2 --out weekly.zip --workers 8
+"""
+import argparse
+import os
+import time
+import zipfile
+
+from dataLoader import IncidentStore
+from incidentCube import incident_cube
+from incidentIndex import incident_index
+from metrics import generate_pdf, pdf_to_bytes
+from metricsFunc import get_baseline_avg_incidents
+from periodWindow import METRIC_RANGES
+from workerPool import process_pool
+
+# Dataset of the current process: set before forking, or loaded by the worker initializer
+_dataset = None
+
+
+def load_dataset(data_dir):
+    """
+    Load the incidents with their rollup and the per-report constants.
+    """
+    df = IncidentStore(data_dir).refresh()
+    incident_cube(df)
+    return {
+        'df': df,
+        'app_displays': incident_index(df).app_labels('app_display'),
+        'baseline_avg_incidents': get_baseline_avg_incidents(df),
+    }
+
+
+def _init_worker(data_dir):
+    global _dataset
+    if _dataset is None:
+        _dataset = load_dataset(data_dir)
+
+
+def render_report(app_id, metric_range):
+    """
+    Render the report of one app with the dataset of this process, as (file name, PDF bytes).
+    """
+    pdf = generate_pdf(_dataset['df'], app_id, _dataset['app_displays'][app_id], metric_range,
+                       _dataset['baseline_avg_incidents'])
+    return f"Metrics_Report_{app_id}.pdf", pdf_to_bytes(pdf)
+
+
+def generate_reports(data_dir, out, app_ids=None, metric_range='1 Week', workers=None):
+    """
+    Write the reports of app_ids (every app by default) to the directory or .zip file out.
+
+    Returns the number of reports written and the seconds spent rendering them.
+    """
+    global _dataset
+    _dataset = load_dataset(data_dir)
+
+    known = _dataset['app_displays'].index
+    app_ids = list(known) if not app_ids else app_ids
+    unknown = sorted(set(app_ids) - set(known))
+    if unknown:
+        raise ValueError(f"Unknown appId(s): {', '.join(unknown)}")
+
+    workers = min(workers or os.cpu_count() or 1, len(app_ids)) or 1
+
+    started = time.perf_counter()
+    with process_pool(workers, _init_worker, (data_dir,)) as pool:
+        reports = pool.map(render_report, app_ids, [metric_range] * len(app_ids),
+                           chunksize=max(1, len(app_ids) // (workers * 4)))
+
+        if out.endswith('.zip'):
+            with zipfile.ZipFile(out, 'w', zipfile.ZIP_DEFLATED) as archive:
+                for file_name, data in reports:
+                    archive.writestr(file_name, data)
+        else:
+            os.makedirs(out, exist_ok=True)
+            for file_name, data in reports:
+                with open(os.path.join(out, file_name), 'wb') as file:
+                    file.write(data)
+
+    return len(app_ids), time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--data-dir', default='', help="directory of the JSON exports (default: current)")
+    parser.add_argument('--apps', nargs='*', help="appIds to report on (default: every app)")
+    parser.add_argument('--range', default='1 Week', choices=METRIC_RANGES, help="metrics range of the reports")
+    parser.add_argument('--out', default='reports', help="output directory, or a file name ending in .zip")
+    parser.add_argument('--workers', type=int, help="worker processes (default: one per CPU)")
+    args = parser.parse_args()
+
+    count, seconds = generate_reports(args.data_dir, args.out, args.apps, args.range, args.workers)
+    print(f"{count} reports written to {args.out} in {seconds:.2f} s ({count / seconds:.1f} reports/s)")
+
+
+if __name__ == '__main__':
+    main()
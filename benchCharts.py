@@ -0,0 +1,61 @@
+"""
+Benchmark the trend chart payload against the length of the selected date range.
+
+Builds a synthetic incident frame (see benchMetrics.py) and renders generate_graph for
+custom date ranges of growing length ending on the last day of data. For each range it
+reports the resolution picked, the points drawn, the bytes of the figure JSON sent to
+the browser and the build time, next to the payload of a daily line of ISO date strings
+with a hover label per point (the encoding used before resolutions were picked).
+
+    python benchCharts.py --apps 50 --rows 1000000
+"""
+import argparse
+
+import pandas as pd
+import plotly.express as px
+import plotly.io as pio
+
+from benchMetrics import synthetic_incidents, timed
+from charts import FIGURE_CACHE, chart_resolution, generate_graph
+from incidentCube import incident_cube
+
+RANGE_DAYS = [30, 90, 180, 365, 730, 1095, 1825]
+
+
+def payload_bytes(fig):
+    # What st.plotly_chart serializes for the browser
+    return len(pio.to_json(fig, validate=False))
+
+
+def daily_string_payload(cube, app_id, start, end):
+    trends = cube.window(app_id, start, end).groupby('day')['count'].sum().reset_index(name='incident_count')
+    labels = trends['day'].dt.strftime('%d %b %Y')
+    fig = px.line(trends.assign(date_label=labels), x='date_label', y='incident_count', markers=True)
+    fig.update_traces(hovertemplate='Date: %{customdata}<br>Incidents: %{y}', customdata=labels)
+    return payload_bytes(fig)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--apps', type=int, default=50)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    df = synthetic_incidents(args.apps, args.rows)
+    cube = incident_cube(df)
+    app_id = df['appId'].cat.categories[0]
+    end = cube.current_date.normalize()
+    print(f"{args.rows:,} incidents, {args.apps:,} apps; trend chart of {app_id} up to {end:%d %b %Y}")
+
+    print(f"{'range days':>10}{'resolution':>12}{'points':>8}{'payload B':>11}{'daily str B':>13}{'build ms':>10}")
+    for days in RANGE_DAYS:
+        start = end - pd.Timedelta(days=days - 1)
+        FIGURE_CACHE.clear()
+        fig, build_ms = timed(generate_graph, app_id, '3 Months', df, start.date(), end.date())
+        resolution = chart_resolution(start, end)
+        print(f"{days:>10}{resolution:>12}{len(fig.data[0].x):>8}{payload_bytes(fig):>11,}"
+              f"{daily_string_payload(cube, app_id, start, end):>13,}{build_ms:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+Benchmark the memory and latency of the compact incident layout against the previous ones.
+
+Builds a synthetic frame of incident rows as parsed from the JSON exports and
+converts it with prepare_incidents (categorical appName/app_display, int8-coded
+severity, float32 duration, app_display labels built once per app) and with the
+previous conversion (string appName and per-row app_display, float64 duration).
+Reports the footprint per column and per layout, the conversion time and the time
+of the work every dashboard rerun or data version repeats on the frame.
+
+    python benchDtypes.py --apps 1000 --rows 5000000
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from benchMetrics import timed
+from dataLoader import prepare_incidents
+from incidentCube import build_cube
+from incidentIndex import sort_incidents
+
+
+def raw_incidents(apps, rows, years=5, seed=0):
+    # The dashboard columns of an export, as read_json returns them
+    rng = np.random.default_rng(seed)
+    app_codes = rng.integers(0, apps, rows)
+    return pd.DataFrame({
+        'appId': np.array([f"A{i:04d}" for i in range(apps)], dtype=object)[app_codes],
+        'appName': np.array([f"Application {i}" for i in range(apps)], dtype=object)[app_codes],
+        'date': pd.Timestamp('2020-01-01') + pd.to_timedelta(rng.integers(0, years * 365 * 24, rows), unit='h'),
+        'severity': rng.choice(np.array(['P1', 'P2', 'P3', 'P4'], dtype=object), rows),
+        'source': rng.choice(np.array(['Auto Bridge', 'Monitoring', 'User Report', 'Change'], dtype=object), rows),
+        'duration': rng.integers(1, 600, rows).astype(float),
+    })
+
+
+def previous_layout(df):
+    # prepare_incidents before the compact layout
+    df = df.reset_index(drop=True)
+    df['date'] = pd.to_datetime(df['date'])
+    df['app_display'] = df['appId'].str.strip() + ' (' + df['appName'].str.strip() + ')'
+    for column in ['appId', 'severity', 'source']:
+        df[column] = df[column].astype('category')
+    return df
+
+
+def mib(value):
+    return value / 2**20
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--apps', type=int, default=1000)
+    parser.add_argument('--rows', type=int, default=5_000_000)
+    args = parser.parse_args()
+
+    raw, build_ms = timed(raw_incidents, args.apps, args.rows)
+    print(f"{args.rows:,} incidents, {args.apps:,} apps (generated in {build_ms:.0f} ms)")
+
+    previous, previous_ms = timed(previous_layout, raw.copy())
+    compact, compact_ms = timed(prepare_incidents, raw.copy())
+    previous, compact = sort_incidents(previous), sort_incidents(compact)
+
+    layouts = {'parsed': raw, 'previous': previous, 'compact': compact}
+    usage = pd.DataFrame({name: df.memory_usage(deep=True, index=False) for name, df in layouts.items()})
+    print(f"\n{'column':<14}" + ''.join(f"{name + ' MiB':>15}" for name in layouts) + f"{'compact dtype':>18}")
+    for column, row in usage.iterrows():
+        dtype = compact[column].dtype if column in compact else ''
+        dtype = f"category[{compact[column].cat.codes.dtype}]" if isinstance(dtype, pd.CategoricalDtype) else dtype
+        print(f"{column:<14}" + ''.join(f"{mib(value):>15.1f}" for value in row.fillna(0)) + f"{str(dtype):>18}")
+    totals = usage.sum()
+    print(f"{'total':<14}" + ''.join(f"{mib(value):>15.1f}" for value in totals)
+          + f"   ({totals['previous'] / totals['compact']:.1f}x smaller than previous, "
+          f"{totals['parsed'] / totals['compact']:.1f}x than parsed)")
+
+    print(f"\n{'ms':<30}{'previous':>12}{'compact':>12}")
+    print(f"{'convert parsed rows':<30}{previous_ms:>12.0f}{compact_ms:>12.0f}")
+    for label, work in [
+        ("app dropdown (unique)", lambda df: df['app_display'].unique()),
+        ("daily rollup", build_cube),
+        ("severity counts", lambda df: df['severity'].value_counts()),
+        ("mean duration", lambda df: df['duration'].mean()),
+    ]:
+        print(f"{label:<30}{timed(work, previous)[1]:>12.1f}{timed(work, compact)[1]:>12.1f}")
+
+    drift = abs(previous['duration'].mean() - compact['duration'].astype('float64').mean())
+    print(f"\nmean duration drift from float32 storage: {drift:.2e} minutes")
+
+
+if __name__ == '__main__':
+    main()
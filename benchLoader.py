@@ -0,0 +1,109 @@
+"""
+Benchmark the incident loader against the original concat path.
+
+Writes synthetic exports (JSON arrays or line-delimited JSON, with extra columns the
+dashboard never reads) to a temporary directory, then times a cold load with:
+
+  concat    pd.concat(map(pd.read_json, ...)) + prepare_incidents, as main.py used to
+  serial    IncidentStore with workers=1 (streaming, projected parsing)
+  parallel  IncidentStore with a process pool
+
+Every case runs in a fresh process so its peak RSS (including pool workers) is reported.
+
+    python benchLoader.py --files 8 --rows 200000 --format jsonl
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+import dataLoader
+
+
+def write_exports(data_dir, files, rows, fmt, seed=0):
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp('2020-01-01')
+    for i in range(files):
+        app_ids = rng.integers(0, 200, rows)
+        df = pd.DataFrame({
+            'incidentId': [f"INC{i:03d}{n:08d}" for n in range(rows)],
+            'appId': [f"A{a:03d}" for a in app_ids],
+            'appName': [f"Application {a}" for a in app_ids],
+            'date': (start + pd.to_timedelta(rng.integers(0, 5 * 365 * 24 * 3600, rows), unit='s')).strftime('%Y-%m-%d %H:%M:%S'),
+            'severity': rng.choice(['P1', 'P2', 'P3', 'P4'], rows),
+            'source': rng.choice(['Auto Bridge', 'Monitoring', 'User Report', 'Change'], rows),
+            'duration': rng.gamma(2.0, 30.0, rows).round(1),
+            # Columns the dashboard never reads
+            'description': ['Service degradation observed on the primary cluster; paged on-call.'] * rows,
+            'assignee': rng.choice(['alice', 'bob', 'carol', 'dave'], rows),
+        })
+        if fmt == 'jsonl':
+            df.to_json(os.path.join(data_dir, f"export_{i:03d}.jsonl"), orient='records', lines=True)
+        else:
+            df.to_json(os.path.join(data_dir, f"export_{i:03d}.json"), orient='records')
+
+
+def load_concat(data_dir):
+    paths = sorted(os.path.join(data_dir, name) for name, _, _ in dataLoader.source_signature(data_dir))
+    if paths[0].endswith('.json'):
+        df = dataLoader.read_json_exports(paths)
+    else:
+        df = pd.concat(pd.read_json(path, lines=True) for path in paths)
+    return dataLoader.prepare_incidents(df)
+
+
+def load_store(data_dir, workers):
+    return dataLoader.IncidentStore(data_dir, workers=workers).refresh()
+
+
+def _run_case(case, data_dir, workers, queue):
+    started = time.perf_counter()
+    df = load_concat(data_dir) if case == 'concat' else load_store(data_dir, workers)
+    elapsed = time.perf_counter() - started
+
+    # ru_maxrss is in KiB on Linux
+    peak_kib = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_kib += resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    queue.put((elapsed, peak_kib / 1024, len(df), df.memory_usage(deep=True).sum() / 2 ** 20))
+
+
+def run_case(case, data_dir, workers):
+    context = multiprocessing.get_context('spawn')
+    queue = context.Queue()
+    process = context.Process(target=_run_case, args=(case, data_dir, workers, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--files', type=int, default=8)
+    parser.add_argument('--rows', type=int, default=100_000, help="rows per export")
+    parser.add_argument('--format', choices=['json', 'jsonl'], default='jsonl')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        write_exports(data_dir, args.files, args.rows, args.format)
+        size_mib = sum(size for _, _, size in dataLoader.source_signature(data_dir)) / 2 ** 20
+        print(f"{args.files} {args.format} exports, {args.files * args.rows:,} rows, {size_mib:.0f} MiB on disk")
+        print(f"{'case':<10}{'seconds':>10}{'peak RSS MiB':>15}{'rows':>12}{'frame MiB':>12}")
+
+        for case in ['concat', 'serial', 'parallel']:
+            # Each store case starts cold
+            shutil.rmtree(os.path.join(data_dir, dataLoader.CACHE_DIR), ignore_errors=True)
+            workers = {'serial': 1, 'parallel': args.workers}.get(case)
+            elapsed, peak_mib, rows, frame_mib = run_case(case, data_dir, workers)
+            print(f"{case:<10}{elapsed:>10.2f}{peak_mib:>15.0f}{rows:>12,}{frame_mib:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
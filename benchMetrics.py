@@ -0,0 +1,75 @@
+"""
+Benchmark the fleet metrics table against looping over the per-app metrics.
+
+Builds a synthetic typed incident frame (the layout load_incidents returns) and times
+compute_fleet_metrics for every metric range, once cold (rollup and index built on the
+first call) and then warm. The per-app loop is timed on a sample of apps and
+extrapolated to the whole fleet.
+
+    python benchMetrics.py --apps 1000 --rows 5000000
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from incidentIndex import sort_incidents
+from metricsFunc import compute_fleet_metrics, compute_metrics_bundle, get_baseline_avg_incidents
+from periodWindow import METRIC_RANGES
+
+# Warm fleet table target for 1,000 apps and 5M incidents
+TARGET_MS = 200
+
+
+def synthetic_incidents(apps, rows, years=5, seed=0):
+    rng = np.random.default_rng(seed)
+    app_ids = [f"A{i:04d}" for i in range(apps)]
+    app_codes = rng.integers(0, apps, rows)
+    days = rng.integers(0, years * 365, rows)
+    return sort_incidents(pd.DataFrame({
+        'appId': pd.Categorical.from_codes(app_codes, app_ids),
+        'appName': pd.Categorical.from_codes(app_codes, [f"Application {i}" for i in range(apps)]),
+        'date': pd.Timestamp('2020-01-01') + pd.to_timedelta(days, unit='D'),
+        'severity': pd.Categorical.from_codes(rng.integers(0, 4, rows), ['P1', 'P2', 'P3', 'P4']),
+        'source': pd.Categorical.from_codes(rng.integers(0, 4, rows), ['Auto Bridge', 'Monitoring', 'User Report', 'Change']),
+        'duration': rng.gamma(2.0, 30.0, rows).astype('float32'),
+        'app_display': pd.Categorical.from_codes(app_codes, [f"{a} (Application {i})" for i, a in enumerate(app_ids)]),
+    }))
+
+
+def timed(function, *args):
+    started = time.perf_counter()
+    result = function(*args)
+    return result, (time.perf_counter() - started) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--apps', type=int, default=1000)
+    parser.add_argument('--rows', type=int, default=5_000_000)
+    parser.add_argument('--sample-apps', type=int, default=20, help="apps timed in the per-app loop")
+    args = parser.parse_args()
+
+    df, build_ms = timed(synthetic_incidents, args.apps, args.rows)
+    print(f"{args.rows:,} incidents, {args.apps:,} apps (generated in {build_ms:.0f} ms)")
+
+    _, cold_ms = timed(compute_fleet_metrics, df, METRIC_RANGES[0])
+    print(f"fleet table, cold (builds rollup + index): {cold_ms:.0f} ms")
+
+    print(f"{'range':<18}{'fleet ms':>10}{'per-app loop ms':>18}")
+    baseline = get_baseline_avg_incidents(df)
+    sample = df['appId'].cat.categories[:args.sample_apps]
+    worst_ms = 0
+    for metric_range in METRIC_RANGES:
+        fleet, fleet_ms = timed(compute_fleet_metrics, df, metric_range)
+        _, loop_ms = timed(lambda: [compute_metrics_bundle(app_id, df, metric_range, baseline) for app_id in sample])
+        worst_ms = max(worst_ms, fleet_ms)
+        print(f"{metric_range:<18}{fleet_ms:>10.1f}{loop_ms * len(fleet) / len(sample):>18.0f}")
+
+    verdict = 'within' if worst_ms < TARGET_MS else 'over'
+    print(f"slowest warm fleet table: {worst_ms:.1f} ms ({verdict} the {TARGET_MS} ms target)")
+
+
+if __name__ == '__main__':
+    main()
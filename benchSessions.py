@@ -0,0 +1,62 @@
+"""
+Benchmark the server's resident memory against the number of concurrent dashboard sessions.
+
+Runs the dashboard (main.py) headless in one process for a growing number of
+sessions, all kept open, over the JSON exports of the current directory. After each
+step it reports the resident memory of the process, the memory added per session
+and what one copy of the incident frame per session would have cost instead.
+
+    python benchSessions.py --sessions 5 10 25 50 100 --memory-map
+"""
+import argparse
+import gc
+import os
+import time
+
+from streamlit.logger import set_log_level
+from streamlit.testing.v1 import AppTest
+
+import dataLoader
+from memoryUsage import resident_bytes
+
+MAIN_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'main.py')
+
+
+def open_session():
+    session = AppTest.from_file(MAIN_SCRIPT, default_timeout=300).run()
+    if session.exception:
+        raise RuntimeError(session.exception[0].value)
+    return session
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--sessions', type=int, nargs='+', default=[5, 10, 25, 50, 100])
+    parser.add_argument('--memory-map', action='store_true', help="serve the frame from a memory-mapped snapshot")
+    args = parser.parse_args()
+
+    # load_incidents runs outside a session here: silence Streamlit's bare mode warnings
+    set_log_level('error')
+    dataLoader.MEMORY_MAP = args.memory_map
+    df = dataLoader.load_incidents('')
+    frame_bytes = int(df.memory_usage(deep=True).sum())
+    print(f"{len(df):,} incidents, frame {frame_bytes / 2**20:.1f} MiB"
+          f"{' (memory-mapped)' if args.memory_map else ''}")
+
+    sessions = [open_session()]
+    gc.collect()
+    base = resident_bytes()
+    print(f"{'sessions':>9}{'resident MiB':>14}{'per session KiB':>17}{'copy per session MiB':>22}{'s':>7}")
+    for count in sorted(args.sessions):
+        started = time.perf_counter()
+        while len(sessions) < count:
+            sessions.append(open_session())
+        gc.collect()
+        resident = resident_bytes()
+        added = (resident - base) / max(len(sessions) - 1, 1)
+        print(f"{len(sessions):>9}{resident / 2**20:>14.1f}{added / 2**10:>17.0f}"
+              f"{(resident + frame_bytes * (len(sessions) - 1)) / 2**20:>22.1f}{time.perf_counter() - started:>7.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,60 +1,107 @@
+import functools
+
+import numpy as np
 import pandas as pd
 import plotly.express as px
 import streamlit as st
 
+from frameCache import dataset_version
+from incidentCube import incident_cube, window_value_counts
+from lruCache import LRUCache
+from periodWindow import period_window
+from profiler import profiled
 
-def generate_graph(app_id, time_range, df, start_date=None, end_date=None):
-    # Ensure 'date' column is in datetime format
-    df['date'] = pd.to_datetime(df['date'])
+# Figures built by the generators below, shared by every session
+FIGURE_CACHE = LRUCache(maxsize=256)
+
+# Most points the trend line of a custom date range is drawn with
+MAX_CHART_POINTS = 120
+
+# Approximate days per bucket of each trend resolution, finest first
+RESOLUTION_DAYS = {'day': 1, 'week': 7, 'month': 30.44}
+
+# Axis title, tick format and hover format of each trend resolution
+RESOLUTION_FORMATS = {
+    'day': ('Date', '%d %b %Y', '%d %b %Y'),
+    'week': ('Week', '%d %b %Y', 'week of %d %b %Y'),
+    'month': ('Month', '%b %Y', '%b %Y'),
+}
+
+
+def chart_resolution(start_date, end_date, max_points=MAX_CHART_POINTS):
+    """
+    Finest resolution that draws the range from start_date to end_date in at most max_points points.
+    """
+    days = (pd.Timestamp(end_date) - pd.Timestamp(start_date)).days + 1
+    for resolution, bucket_days in RESOLUTION_DAYS.items():
+        if days / bucket_days <= max_points:
+            return resolution
+    return 'month'
+
+
+def epoch_milliseconds(dates):
+    # Plotly date axes take epoch milliseconds, which serialize as a compact typed array
+    return dates.to_numpy(dtype='datetime64[ms]').astype(np.float64)
 
-    current_date = df['date'].max()
+
+def cached_figure(generate):
+    """
+    Serve a chart generator's figures from FIGURE_CACHE, keyed on the dataset version and selection.
+
+    Selections without a figure (no data, invalid dates) are not cached, so their warning
+    is shown again on every run.
+    """
+    @functools.wraps(generate)
+    def cached(app_id, time_range, df, start_date=None, end_date=None):
+        key = (generate.__name__, dataset_version(df), app_id, time_range, start_date, end_date)
+        fig = FIGURE_CACHE.get_or_create(key, lambda: generate(app_id, time_range, df, start_date, end_date))
+        if fig is None:
+            FIGURE_CACHE.discard(key)
+        return fig
+
+    return cached
+
+
+@profiled
+@cached_figure
+def generate_graph(app_id, time_range, df, start_date=None, end_date=None):
+    cube = incident_cube(df)
 
     if start_date and end_date:
-        # Filter data based on selected date range
+        # Filter data based on selected date range, bucketed so the line stays under MAX_CHART_POINTS
         start_date = pd.to_datetime(start_date)
         end_date = pd.to_datetime(end_date)
-        df_time_filtered = df[(df['date'] >= start_date) & (df['date'] <= end_date)]
-        date_label_format = '%d %b %Y'
+        start_of_range, end_of_range = start_date, end_date
+        resolution = chart_resolution(start_date, end_date)
         title_time_range = f"{start_date.strftime('%d %b %Y')} to {end_date.strftime('%d %b %Y')}"
-        hover_date_format = '%d %b %Y'
     else:
         # Filter data based on predefined time range
-        if time_range == '6 Months':
-            start_of_range = (current_date - pd.DateOffset(months=5)).replace(day=1)
-        elif time_range == '3 Months':
-            start_of_range = (current_date - pd.DateOffset(months=2)).replace(day=1)
-        elif time_range == '1 Year':
-            start_of_range = (current_date - pd.DateOffset(years=1)).replace(day=1)
-        else:
-            start_of_range = current_date.replace(day=1)  # Default to current month
-
-        df_time_filtered = df[(df['date'] >= start_of_range) & (df['date'] <= current_date)]
-        date_label_format = '%b %Y'
-        title_time_range = f"{start_of_range.strftime('%d %b %Y')} to {current_date.strftime('%d %b %Y')}"
-        hover_date_format = '%b %Y'
-
-    # Aggregate counts by date
-    df_time_filtered['date'] = df_time_filtered['date'].dt.to_period('D') if start_date and end_date else \
-    df_time_filtered['date'].dt.to_period('M')
-    incident_trends = df_time_filtered[df_time_filtered['appId'] == app_id].groupby('date').size().reset_index(
-        name='incident_count')
-    incident_trends['date_end'] = incident_trends['date'].dt.to_timestamp()  # Get the last day of each period
-    incident_trends['date_label'] = incident_trends['date_end'].dt.strftime('%d %b %Y') if start_date and end_date else \
-    incident_trends['date_end'].dt.strftime('%b %Y')  # Label for the x-axis
+        window = period_window(df, time_range)
+        start_of_range, end_of_range = window.start, window.end
+        resolution = 'month'
+        title_time_range = f"{start_of_range.strftime('%d %b %Y')} to {end_of_range.strftime('%d %b %Y')}"
+    axis_title, date_label_format, hover_date_format = RESOLUTION_FORMATS[resolution]
+
+    # Aggregate counts by day, week or month (all precomputed in the rollup)
+    cube_specific_app = cube.window(app_id, start_of_range, end_of_range)
+    incident_trends = cube_specific_app.groupby(resolution)['count'].sum().reset_index(name='incident_count')
+    incident_trends['date_end'] = incident_trends['day'] if resolution == 'day' else \
+    incident_trends[resolution].dt.start_time  # Get the first day of each week or month
 
     # Create an interactive line chart
-    fig = px.line(incident_trends, x='date_label', y='incident_count',
+    fig = px.line(incident_trends, x='date_end', y='incident_count',
                   title=f'Trends of SRE Incidents for App ID: {app_id} from {title_time_range}',
-                  labels={'date_label': 'Date' if start_date and end_date else 'Month',
-                          'incident_count': 'Number of Incidents'},
+                  labels={'date_end': axis_title, 'incident_count': 'Number of Incidents'},
                   markers=True)
 
+    # Send the dates as a typed array of epoch milliseconds rather than ISO strings, and format
+    # them in the browser instead of shipping a hover label per point
     fig.update_traces(mode='markers+lines', line=dict(color='red'),
-                      hovertemplate='Date: %{customdata}<br>Incidents: %{y}',
-                      customdata=incident_trends['date_end'].dt.strftime(hover_date_format))
+                      x=epoch_milliseconds(incident_trends['date_end']),
+                      hovertemplate=f'Date: %{{x|{hover_date_format}}}<br>Incidents: %{{y}}')
 
     fig.update_layout(
-        xaxis_title='Date' if start_date and end_date else 'Month',
+        xaxis_title=axis_title,
         yaxis_title='Number of Incidents',
         hovermode='x',
         yaxis=dict(tickmode='linear', tick0=0, dtick=2),  # Ensure y-axis has intervals of 2
@@ -65,47 +112,41 @@ def generate_graph(app_id, time_range, df, start_date=None, end_date=None):
             'xanchor': 'center',
             'yanchor': 'top'
         },
-        xaxis=dict(tickformat=date_label_format)  # Format x-axis to show date or month/year
+        xaxis=dict(type='date', tickformat=date_label_format)  # Format x-axis to show date or month/year
     )
 
     return fig
 
 
+@profiled
+@cached_figure
 def generate_source_graph(app_id, time_range, df, start_date=None, end_date=None):
-    # Ensure 'date' column is in datetime format
-    df['date'] = pd.to_datetime(df['date'])
-    current_date = df['date'].max()
+    cube = incident_cube(df)
 
     if start_date and end_date:
         # Ensure both dates are provided
         try:
             start_date = pd.to_datetime(start_date)
             end_date = pd.to_datetime(end_date)
-            df_time_filtered = df[(df['date'] >= start_date) & (df['date'] <= end_date)]
+            start_of_range, end_of_range = start_date, end_date
             title_time_range = f"{start_date.strftime('%d %b %Y')} to {end_date.strftime('%d %b %Y')}"
         except Exception as e:
             st.error(f"Error in date range filtering: {e}")
             return
     else:
         # Handle predefined time ranges
-        if time_range == '6 Months':
-            start_of_range = (current_date - pd.DateOffset(months=5)).replace(day=1)
-        elif time_range == '3 Months':
-            start_of_range = (current_date - pd.DateOffset(months=2)).replace(day=1)
-        elif time_range == '1 Year':
-            start_of_range = (current_date - pd.DateOffset(years=1)).replace(day=1)
-        else:
-            start_of_range = current_date.replace(day=1)  # Default to current month
-
-        df_time_filtered = df[(df['date'] >= start_of_range) & (df['date'] <= current_date)]
-        title_time_range = f"{start_of_range.strftime('%d %b %Y')} to {current_date.strftime('%d %b %Y')}"
-
-    if df_time_filtered.empty:
+        window = period_window(df, time_range)
+        start_of_range, end_of_range = window.start, window.end
+        title_time_range = f"{start_of_range.strftime('%d %b %Y')} to {end_of_range.strftime('%d %b %Y')}"
+
+    if not cube.has_incidents(start_of_range, end_of_range):
         st.warning("No data available for the selected range.")
         return
 
     # Aggregate counts by source
-    incident_sources = df_time_filtered[df_time_filtered['appId'] == app_id]['source'].value_counts().reset_index()
+    cube_specific_app = cube.window(app_id, start_of_range, end_of_range)
+    incident_sources = window_value_counts(cube_specific_app, 'source')
+    incident_sources = incident_sources[incident_sources > 0].reset_index()  # Categoricals also count unused sources
     incident_sources.columns = ['source', 'incident_count']
 
     # Create an interactive bar chart
@@ -132,44 +173,36 @@ def generate_source_graph(app_id, time_range, df, start_date=None, end_date=None
     return fig
 
 
+@profiled
+@cached_figure
 def generate_pie_chart(app_id, time_range, df, start_date=None, end_date=None):
-    # Ensure 'date' column is in datetime format
-    df['date'] = pd.to_datetime(df['date'])
-    current_date = df['date'].max()
+    cube = incident_cube(df)
 
     if start_date and end_date:
         # Ensure both dates are provided
         try:
             start_date = pd.to_datetime(start_date)
             end_date = pd.to_datetime(end_date)
-            df_time_filtered = df[(df['date'] >= start_date) & (df['date'] <= end_date)]
+            start_of_range, end_of_range = start_date, end_date
             title_time_range = f"{start_date.strftime('%d %b %Y')} to {end_date.strftime('%d %b %Y')}"
         except Exception as e:
             st.error(f"Error in date range filtering: {e}")
             return
     else:
         # Handle predefined time ranges
-        if time_range == '6 Months':
-            start_of_range = (current_date - pd.DateOffset(months=5)).replace(day=1)
-        elif time_range == '3 Months':
-            start_of_range = (current_date - pd.DateOffset(months=2)).replace(day=1)
-        elif time_range == '1 Year':
-            start_of_range = (current_date - pd.DateOffset(years=1)).replace(day=1)
-        else:
-            start_of_range = current_date.replace(day=1)  # Default to current month
-
-        df_time_filtered = df[(df['date'] >= start_of_range) & (df['date'] <= current_date)]
-        title_time_range = f"{start_of_range.strftime('%d %b %Y')} to {current_date.strftime('%d %b %Y')}"
-
-    if df_time_filtered.empty:
+        window = period_window(df, time_range)
+        start_of_range, end_of_range = window.start, window.end
+        title_time_range = f"{start_of_range.strftime('%d %b %Y')} to {end_of_range.strftime('%d %b %Y')}"
+
+    if not cube.has_incidents(start_of_range, end_of_range):
         st.warning("No data available for the selected range.")
         return
 
     # Filter the data for the specific appId
-    df_specific_app = df_time_filtered[df_time_filtered['appId'] == app_id]
+    cube_specific_app = cube.window(app_id, start_of_range, end_of_range)
 
     # Group by severity, and count the number of incidents
-    incident_severity = df_specific_app.groupby(['severity']).size().reset_index(name='incident_count')
+    incident_severity = cube_specific_app.groupby(['severity'], observed=True)['count'].sum().reset_index(name='incident_count')
 
     # Define custom colors for the red-black theme
     colors = ["#E1D8D6", "#050100", "#8C8786", "#FC2F03", "#B42A0D", "#936960", "#F95330"]
@@ -197,45 +230,36 @@ def generate_pie_chart(app_id, time_range, df, start_date=None, end_date=None):
     return fig
 
 
+@profiled
+@cached_figure
 def generate_severity_bar_chart(app_id, time_range, df, start_date=None, end_date=None):
-    # Ensure 'date' column is in datetime format
-    df['date'] = pd.to_datetime(df['date'])
-    current_date = df['date'].max()
+    cube = incident_cube(df)
 
     if start_date and end_date:
         # Ensure both dates are provided
         try:
             start_date = pd.to_datetime(start_date)
             end_date = pd.to_datetime(end_date)
-            df_time_filtered = df[(df['date'] >= start_date) & (df['date'] <= end_date)]
+            start_of_range, end_of_range = start_date, end_date
             title_time_range = f"{start_date.strftime('%d %b %Y')} to {end_date.strftime('%d %b %Y')}"
         except Exception as e:
             st.error(f"Error in date range filtering: {e}")
             return
     else:
         # Handle predefined time ranges
-        if time_range == '6 Months':
-            start_of_range = (current_date - pd.DateOffset(months=5)).replace(day=1)
-        elif time_range == '3 Months':
-            start_of_range = (current_date - pd.DateOffset(months=2)).replace(day=1)
-        elif time_range == '1 Year':
-            start_of_range = (current_date - pd.DateOffset(years=1)).replace(day=1)
-        else:
-            start_of_range = current_date.replace(day=1)  # Default to current month
-
-        df_time_filtered = df[(df['date'] >= start_of_range) & (df['date'] <= current_date)]
-        title_time_range = f"{start_of_range.strftime('%d %b %Y')} to {current_date.strftime('%d %b %Y')}"
-
-    if df_time_filtered.empty:
+        window = period_window(df, time_range)
+        start_of_range, end_of_range = window.start, window.end
+        title_time_range = f"{start_of_range.strftime('%d %b %Y')} to {end_of_range.strftime('%d %b %Y')}"
+
+    if not cube.has_incidents(start_of_range, end_of_range):
         st.warning("No data available for the selected range.")
         return
 
     # Filter the data for the specific appId
-    df_specific_app = df_time_filtered[df_time_filtered['appId'] == app_id]
+    cube_specific_app = cube.window(app_id, start_of_range, end_of_range)
 
     # Aggregate counts by month and severity
-    df_specific_app['month'] = df_specific_app['date'].dt.to_period('M')
-    incident_severity_monthly = df_specific_app.groupby(['month', 'severity']).size().reset_index(name='incident_count')
+    incident_severity_monthly = cube_specific_app.groupby(['month', 'severity'], observed=True)['count'].sum().reset_index(name='incident_count')
     incident_severity_monthly['month_end'] = incident_severity_monthly['month'].dt.to_timestamp('M')  # Get the last day of each month
     incident_severity_monthly['month_label'] = incident_severity_monthly['month_end'].dt.strftime('%b %Y')  # Label for the x-axis
 
@@ -0,0 +1,157 @@
+"""
+Compact export of fitted SARIMAX models, served with NumPy alone.
+
+The export keeps what predictions need: the (time-invariant) state space matrices
+of the fitted parameters, the filter state at the end of the sample and the
+one-step-ahead predictions over the sample. It is a few kB to a few hundred kB
+against megabytes of pickled results, and loading it imports neither statsmodels
+nor the training data.
+
+    python compactModel.py sarima_auto_bridge_opn_issues.pkl
+"""
+import argparse
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+
+COMPACT_SUFFIX = '.npz'
+
+# State space matrices of the fitted model (all time-invariant for SARIMAX without exog)
+MATRICES = ['design', 'obs_intercept', 'obs_cov', 'transition', 'state_intercept', 'selection', 'state_cov']
+
+
+def compact_path(path):
+    return os.path.splitext(path)[0] + COMPACT_SUFFIX
+
+
+def export_compact(results, path):
+    """
+    Write the compact export of fitted SARIMAX results to path (.npz).
+    """
+    model, filtered = results.model, results.filter_results
+    index = model._index
+    if model.k_exog or not isinstance(index, pd.DatetimeIndex) or index.freq is None:
+        raise ValueError("Only models without exog on a regular DatetimeIndex can be exported")
+    if any(getattr(filtered, name).shape[-1] != 1 for name in MATRICES):
+        raise ValueError("Only models with time-invariant state space matrices can be exported")
+
+    with open(path + '.tmp', 'wb') as file:
+        np.savez_compressed(
+            file,
+            first_date=np.array(index[0].isoformat()),
+            freq=np.array(index.freqstr),
+            # One-step-ahead predictions over the sample
+            fitted_mean=filtered.forecasts[0],
+            fitted_var=filtered.forecasts_error_cov[0, 0],
+            # Predicted state (and its covariance) for the first period after the sample
+            predicted_state=filtered.predicted_state[:, -1],
+            predicted_state_cov=filtered.predicted_state_cov[:, :, -1],
+            **{name: getattr(filtered, name)[..., 0] for name in MATRICES},
+        )
+    os.replace(path + '.tmp', path)
+
+
+class CompactPrediction:
+    """
+    The part of statsmodels' PredictionResults the dashboard uses.
+    """
+
+    def __init__(self, predicted_mean, var_pred_mean):
+        self.predicted_mean = predicted_mean
+        self.var_pred_mean = var_pred_mean
+
+    def conf_int(self, alpha=0.05):
+        from statistics import NormalDist
+
+        width = NormalDist().inv_cdf(1 - alpha / 2) * np.sqrt(self.var_pred_mean.to_numpy())
+        mean = self.predicted_mean.to_numpy()
+        return pd.DataFrame({'lower y': mean - width, 'upper y': mean + width}, index=self.predicted_mean.index)
+
+
+class CompactModel:
+    """
+    Predictor over a compact export: in-sample values come from the stored one-step-ahead
+    predictions and later ones from the Kalman filter recursions, so get_prediction
+    returns what the statsmodels results it was exported from return.
+    """
+
+    def __init__(self, arrays):
+        self.fitted_mean = arrays['fitted_mean']
+        self.fitted_var = arrays['fitted_var']
+        self.predicted_state = arrays['predicted_state']
+        self.predicted_state_cov = arrays['predicted_state_cov']
+        self.design = arrays['design']
+        self.obs_intercept = arrays['obs_intercept']
+        self.obs_cov = arrays['obs_cov']
+        self.transition = arrays['transition']
+        self.state_intercept = arrays['state_intercept']
+        self.selected_state_cov = arrays['selection'] @ arrays['state_cov'] @ arrays['selection'].T
+        self.nobs = len(self.fitted_mean)
+        self.index = pd.date_range(pd.Timestamp(str(arrays['first_date'])), periods=self.nobs,
+                                   freq=str(arrays['freq']))
+
+    @property
+    def nbytes(self):
+        """
+        Bytes held by the model's arrays and date index: its whole memory footprint.
+        """
+        return sum(value.nbytes for value in vars(self).values() if isinstance(value, (np.ndarray, pd.Index)))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as arrays:
+            return cls({name: arrays[name] for name in arrays.files})
+
+    def _position(self, date):
+        if isinstance(date, (int, np.integer)):
+            return int(date)
+        date = pd.Timestamp(date)
+        if date < self.index[0]:
+            raise KeyError(f"{date} is before the start of the model's data")
+        return len(pd.date_range(self.index[0], date, freq=self.index.freq)) - 1
+
+    def forecast(self, steps):
+        """
+        Mean and variance of the steps periods after the sample.
+        """
+        mean, var = np.empty(steps), np.empty(steps)
+        state, state_cov = self.predicted_state, self.predicted_state_cov
+        for step in range(steps):
+            mean[step] = (self.design @ state + self.obs_intercept)[0]
+            var[step] = (self.design @ state_cov @ self.design.T + self.obs_cov)[0, 0]
+            state = self.transition @ state + self.state_intercept
+            state_cov = self.transition @ state_cov @ self.transition.T + self.selected_state_cov
+        return mean, var
+
+    def get_prediction(self, start=None, end=None):
+        start = 0 if start is None else self._position(start)
+        end = self.nobs - 1 if end is None else self._position(end)
+        mean, var = self.fitted_mean[start:end + 1], self.fitted_var[start:end + 1]
+        if end >= self.nobs:
+            forecast_mean, forecast_var = self.forecast(end + 1 - self.nobs)
+            skip = max(start - self.nobs, 0)
+            mean = np.concatenate([mean, forecast_mean[skip:]])
+            var = np.concatenate([var, forecast_var[skip:]])
+
+        index = pd.date_range(self.index[0], periods=end + 1, freq=self.index.freq)[start:]
+        return CompactPrediction(pd.Series(mean, index=index, name='predicted_mean'),
+                                 pd.Series(var, index=index, name='var_pred_mean'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('model', help="pickled statsmodels results")
+    parser.add_argument('--out', help="compact export to write (default: the model's name with .npz)")
+    args = parser.parse_args()
+
+    out = args.out or compact_path(args.model)
+    with open(args.model, 'rb') as file:
+        export_compact(pickle.load(file), out)
+    print(f"{args.model} ({os.path.getsize(args.model) / 2**10:.0f} KiB) -> {out} "
+          f"({os.path.getsize(out) / 2**10:.0f} KiB)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,506 @@
+import contextlib
+import glob
+import hashlib
+import json
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import streamlit as st
+from pandas.api.types import union_categoricals
+
+from frameCache import derived
+from incidentCube import incident_cube
+from incidentIndex import sort_incidents
+from profiler import count_rows, profiled
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    import msvcrt
+    fcntl = None
+
+# Folder (inside the data directory) that holds the typed columnar snapshot
+CACHE_DIR = '.incident_cache'
+PARTS_DIR = 'parts'
+MANIFEST_FILE = 'manifest.json'
+# Held while a process reads or updates the cache: the dashboard, the API server and the
+# command line tools (and their workers) may all refresh the same directory at once
+LOCK_FILE = 'lock'
+
+# Low-cardinality string columns stored as categoricals (category is optional in the exports)
+CATEGORICAL_COLUMNS = ['appId', 'appName', 'app_display', 'severity', 'source', 'category']
+
+# Severity categories come in this order (int8 codes 0-3); unexpected labels follow them
+SEVERITY_LEVELS = ['P1', 'P2', 'P3', 'P4']
+
+# Durations are minutes: float32 holds whole minutes exactly up to 2**24 and keeps missing ones as NaN
+DURATION_DTYPE = 'float32'
+
+# Columns that identify an incident; exports without an id column are deduplicated on the whole record
+INCIDENT_ID_COLUMNS = ['incidentId', 'id']
+
+# Columns the dashboard reads; everything else in an export is dropped while parsing
+DASHBOARD_COLUMNS = ['appId', 'appName', 'date', 'severity', 'source', 'category', 'duration']
+
+# Serve the assembled frame from a memory-mapped Arrow snapshot (see IncidentStore)
+MEMORY_MAP = False
+SNAPSHOT_PREFIX = 'snapshot-'
+
+# Bumped whenever the parsed layout changes, so parts written by older code are re-parsed
+PART_FORMAT = 3
+
+# Exports are JSON arrays (*.json) or line-delimited JSON (*.jsonl / *.ndjson, or a *.json starting with '{')
+EXPORT_PATTERNS = ["*.json", "*.jsonl", "*.ndjson"]
+
+# Rows per chunk when streaming line-delimited exports
+CHUNK_ROWS = 100_000
+
+# Longest first line read when telling line-delimited *.json exports from JSON documents
+MAX_RECORD_BYTES = 1024 * 1024
+
+# Only start a process pool when there is enough to parse to pay for the worker start-up
+PARALLEL_MIN_BYTES = 32 * 1024 * 1024
+
+
+# Cache files are created private by tempfile; give them the permissions open() would
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def _write_replacing(path, write):
+    """
+    Call write() on a temporary file of its own next to path, then rename it over path.
+
+    Readers see the old or the new file, never a partial one, and processes writing
+    the same path at once do not share a temporary file.
+    """
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=os.path.basename(path) + '.', suffix='.tmp')
+    os.close(fd)
+    try:
+        os.chmod(temp_path, 0o666 & ~_UMASK)
+        write(temp_path)
+        os.replace(temp_path, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(temp_path)
+        raise
+
+
+@contextlib.contextmanager
+def _cache_lock(cache_dir):
+    """
+    Hold the lock of cache_dir, waiting for the process holding it.
+    """
+    os.makedirs(os.path.join(cache_dir, PARTS_DIR), exist_ok=True)
+    with open(os.path.join(cache_dir, LOCK_FILE), 'a+b') as file:
+        if fcntl is not None:
+            fcntl.flock(file, fcntl.LOCK_EX)
+        else:
+            file.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(file.fileno(), msvcrt.LK_LOCK, 1)  # Gives up after 10 s
+                    break
+                except OSError:
+                    pass
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(file, fcntl.LOCK_UN)
+            else:
+                file.seek(0)
+                msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def source_signature(data_dir=''):
+    """
+    Describe the JSON exports in data_dir as (file name, mtime, size) tuples.
+    """
+    signature = []
+    paths = {path for pattern in EXPORT_PATTERNS for path in glob.glob(os.path.join(data_dir, pattern))}
+    for path in sorted(paths):
+        stat = os.stat(path)
+        signature.append((os.path.basename(path), stat.st_mtime_ns, stat.st_size))
+    return tuple(signature)
+
+
+def read_json_exports(paths):
+    # Load JSON data into a DataFrame
+    return pd.concat(map(pd.read_json, paths))
+
+
+def prepare_incidents(df):
+    """
+    Convert a raw incident frame into the typed layout used by the dashboard.
+    """
+    df = df.reset_index(drop=True)
+
+    # Convert the date column to datetime
+    df['date'] = pd.to_datetime(df['date'])
+    df['duration'] = df['duration'].astype(DURATION_DTYPE)
+
+    for column in CATEGORICAL_COLUMNS:
+        if column == 'severity' and column in df.columns:
+            extra = sorted(set(df[column].dropna().unique()) - set(SEVERITY_LEVELS))
+            df[column] = df[column].astype(pd.CategoricalDtype(SEVERITY_LEVELS + extra))
+        elif column in df.columns:
+            df[column] = df[column].astype('category')
+
+    # Combine appId and appName for display in the dropdown
+    df['app_display'] = app_display_labels(df['appId'], df['appName'])
+
+    return df
+
+
+def app_display_labels(app_ids, app_names):
+    """
+    Categorical 'appId (appName)' labels of the categorical appId and appName columns.
+
+    The labels are built once per distinct (appId, appName) pair, not once per row.
+    Rows missing either part get a missing label.
+    """
+    id_codes = app_ids.cat.codes.to_numpy(np.int64)
+    name_codes = app_names.cat.codes.to_numpy(np.int64)
+    missing = (id_codes < 0) | (name_codes < 0)
+    if missing.all():
+        return pd.Categorical([None] * len(missing), categories=pd.Index([], dtype=str))
+
+    names = len(app_names.cat.categories)
+    row_pairs, pairs = pd.factorize(np.where(missing, 0, id_codes * names + name_codes))
+    labels = (app_ids.cat.categories.take(pairs // names).str.strip() + ' ('
+              + app_names.cat.categories.take(pairs % names).str.strip() + ')')
+    label_codes, categories = pd.factorize(labels)
+    codes = label_codes[row_pairs]
+    codes[missing] = -1
+    return pd.Categorical.from_codes(codes, categories)
+
+
+def _project(df):
+    id_columns = [column for column in INCIDENT_ID_COLUMNS if column in df.columns][:1]
+    return df[[column for column in DASHBOARD_COLUMNS + id_columns if column in df.columns]]
+
+
+def _is_line_delimited(path):
+    """
+    Whether path holds one JSON record per line: *.jsonl / *.ndjson, or a *.json whose
+    first line is a complete record (not e.g. a pretty-printed or column-oriented object).
+    """
+    if not path.endswith('.json'):
+        return True
+    with open(path, 'rb') as file:
+        first_line = b''
+        while not first_line.strip():
+            first_line = file.readline(MAX_RECORD_BYTES)
+            if not first_line:
+                return False
+    try:
+        record = json.loads(first_line)
+    except ValueError:
+        return False
+    # Column- and index-oriented frames are objects of objects; a record holds scalars
+    return isinstance(record, dict) and not all(isinstance(value, (dict, list)) for value in record.values())
+
+
+def parse_export(path, chunk_rows=CHUNK_ROWS):
+    """
+    Parse one export into a typed incident frame holding only the dashboard columns.
+
+    Line-delimited exports are streamed in chunks of chunk_rows, so peak memory is
+    bounded by one raw chunk plus the (compact) typed result.
+    """
+    if not _is_line_delimited(path):
+        df = prepare_incidents(_project(pd.read_json(path)))
+    else:
+        with pd.read_json(path, lines=True, chunksize=chunk_rows) as reader:
+            df = concat_incidents(prepare_incidents(_project(chunk)) for chunk in reader)
+    count_rows(len(df))
+    return df
+
+
+def _parse_export_to_part(path, part_path, chunk_rows):
+    # Runs in a worker process: write the part straight to disk instead of pickling the frame back
+    part = parse_export(path, chunk_rows)
+    _write_replacing(part_path, lambda temp_path: part.to_parquet(temp_path, index=False))
+    return len(part)
+
+
+def concat_incidents(frames):
+    """
+    Concatenate typed incident frames, keeping the categorical columns categorical.
+    """
+    frames = list(frames)
+    if len(frames) > 1:
+        for column in CATEGORICAL_COLUMNS:
+            present = [frame[column] for frame in frames if column in frame.columns]
+            if not present:
+                continue
+            dtype = pd.CategoricalDtype(union_categoricals(present).categories)
+            # Exports without the (optional) column get it as missing values
+            frames = [frame.astype({column: dtype}) if column in frame.columns
+                      else frame.assign(**{column: pd.Categorical([None] * len(frame), dtype=dtype)})
+                      for frame in frames]
+    return pd.concat(frames, ignore_index=True)
+
+
+def incident_key_hashes(df):
+    """
+    Hash every row of one export's incident key into a uint64 array.
+    """
+    key_columns = [column for column in INCIDENT_ID_COLUMNS if column in df.columns][:1]
+    if key_columns:
+        return pd.util.hash_pandas_object(df[key_columns], index=False).to_numpy()
+
+    # Without an id, identical records repeated inside one export are separate incidents: number the repeats
+    record_hashes = pd.util.hash_pandas_object(df.drop(columns='app_display'), index=False)
+    occurrence = record_hashes.groupby(record_hashes.to_numpy()).cumcount()
+    keys = pd.DataFrame({'record': record_hashes.to_numpy(), 'occurrence': occurrence.to_numpy()})
+    return pd.util.hash_pandas_object(keys, index=False).to_numpy()
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _part_names(manifest):
+    return {name: entry.get('part') for name, entry in manifest.items()}
+
+
+class IncidentStore:
+    """
+    Incident data for one directory of JSON exports, kept up to date incrementally.
+
+    A manifest records every export already ingested (hash, mtime, size, row count)
+    next to a typed Parquet part per export. refresh() only parses new or changed
+    exports; new ones are deduplicated on the incident key and appended in memory.
+    The frame is kept sorted by (appId, date), the layout incidentIndex slices.
+
+    Several processes may share the cache: a refresh holds its lock file, starts from
+    the manifest on disk and rebuilds the frame when another process changed it.
+
+    workers sets the size of the process pool used when a refresh has more than
+    PARALLEL_MIN_BYTES of exports to parse (default: one per CPU, 1 disables it).
+
+    With memory_map, every version of the frame is written once as an uncompressed
+    Arrow file and read back memory-mapped: its numeric and date columns then point
+    into the page cache instead of the heap, shared with any other process serving
+    the same directory and paged out under memory pressure.
+    """
+
+    def __init__(self, data_dir='', workers=None, chunk_rows=CHUNK_ROWS, memory_map=False):
+        self.data_dir = data_dir
+        self.memory_map = memory_map
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_rows = chunk_rows
+        self.cache_dir = os.path.join(data_dir, CACHE_DIR)
+        self.df = None
+        self.version = None
+        self._manifest = self._read_manifest()
+        self._key_hashes = np.empty(0, dtype=np.uint64)  # Sorted, for binary-search dedup
+        self._lock = threading.Lock()
+
+    def _read_manifest(self):
+        try:
+            with open(os.path.join(self.cache_dir, MANIFEST_FILE)) as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_manifest(self):
+        def write(temp_path):
+            with open(temp_path, 'w') as file:
+                json.dump(self._manifest, file, indent=1)
+
+        _write_replacing(os.path.join(self.cache_dir, MANIFEST_FILE), write)
+
+        # Drop parts that no export refers to anymore; under the cache lock, this manifest is the latest
+        parts_dir = os.path.join(self.cache_dir, PARTS_DIR)
+        live_parts = {entry['part'] for entry in self._manifest.values()}
+        for name in os.listdir(parts_dir):
+            if name not in live_parts:
+                os.remove(os.path.join(parts_dir, name))
+
+    def _part_path(self, name):
+        return os.path.join(self.cache_dir, PARTS_DIR, self._manifest[name]['part'])
+
+    @staticmethod
+    def _part_name(sha256):
+        # Parts are content-addressed, so a renamed export reuses its part
+        return f"{sha256[:16]}-v{PART_FORMAT}.parquet"
+
+    def _has_part(self, name):
+        entry = self._manifest[name]
+        return entry['part'] == self._part_name(entry['sha256']) and os.path.exists(self._part_path(name))
+
+    def _ingest(self, pending):
+        """
+        Parse the pending exports into parts, in parallel when there is enough data.
+        """
+        jobs = []
+        for name, mtime, size, sha256 in pending:
+            part_name = self._part_name(sha256)
+            jobs.append((os.path.join(self.data_dir, name), os.path.join(self.cache_dir, PARTS_DIR, part_name)))
+            self._manifest[name] = {'sha256': sha256, 'mtime': mtime, 'size': size, 'part': part_name}
+
+        paths, part_paths = zip(*jobs)
+        chunk_rows = [self.chunk_rows] * len(jobs)
+        if self.workers > 1 and len(jobs) > 1 and sum(size for _, _, size, _ in pending) >= PARALLEL_MIN_BYTES:
+            # spawn, not fork: the Streamlit server process is multi-threaded
+            with ProcessPoolExecutor(max_workers=min(self.workers, len(jobs)),
+                                     mp_context=multiprocessing.get_context('spawn')) as pool:
+                row_counts = list(pool.map(_parse_export_to_part, paths, part_paths, chunk_rows))
+        else:
+            row_counts = list(map(_parse_export_to_part, paths, part_paths, chunk_rows))
+
+        for (name, _, _, _), rows in zip(pending, row_counts):
+            self._manifest[name]['rows'] = rows
+
+    def _scan(self):
+        """
+        Compare the exports on disk with the manifest.
+
+        Returns the freshly parsed parts of new exports and whether a previously
+        ingested export was modified or deleted.
+        """
+        signature = source_signature(self.data_dir)
+        pending = []
+        invalidated = set(self._manifest) - {name for name, _, _ in signature}
+
+        for name, mtime, size in signature:
+            entry = self._manifest.get(name)
+            if entry and entry['mtime'] == mtime and entry['size'] == size and self._has_part(name):
+                continue
+
+            # mtime/size changed: only re-parse when the content really differs
+            sha256 = file_sha256(os.path.join(self.data_dir, name))
+            if entry and entry['sha256'] == sha256 and self._has_part(name):
+                entry.update(mtime=mtime, size=size)
+                continue
+
+            pending.append((name, mtime, size, sha256))
+            if entry:
+                invalidated.add(name)
+
+        for name in invalidated - {name for name, _, _ in signature}:
+            del self._manifest[name]
+
+        if pending:
+            self._ingest(pending)
+        new_parts = [] if invalidated else [pd.read_parquet(self._part_path(name)) for name, _, _, _ in pending]
+
+        return new_parts, bool(invalidated)
+
+    def _rebuild(self):
+        # Re-assemble from the cached parts; only exports that changed were parsed again
+        parts = [pd.read_parquet(self._part_path(name)) for name in sorted(self._manifest)]
+        df = concat_incidents(parts)
+        hashes = np.concatenate([incident_key_hashes(part) for part in parts])
+        _, first_rows = np.unique(hashes, return_index=True)
+        if len(first_rows) < len(df):
+            df = df.iloc[np.sort(first_rows)].reset_index(drop=True)
+        self.df = sort_incidents(df)
+        self._key_hashes = np.sort(hashes[np.sort(first_rows)])
+
+    def _append(self, parts):
+        new_rows = concat_incidents(parts)
+        hashes = np.concatenate([incident_key_hashes(part) for part in parts])
+
+        # Keep rows whose key is neither already stored nor repeated within the new batch
+        positions = np.searchsorted(self._key_hashes, hashes)
+        known = positions < len(self._key_hashes)
+        known[known] = self._key_hashes[positions[known]] == hashes[known]
+        _, first_rows = np.unique(hashes, return_index=True)
+        keep = np.zeros(len(new_rows), dtype=bool)
+        keep[first_rows] = True
+        keep &= ~known
+
+        if keep.any():
+            self.df = sort_incidents(concat_incidents([self.df, new_rows[keep]]))
+            self._key_hashes = np.sort(np.concatenate([self._key_hashes, hashes[keep]]))
+
+    def _mapped_snapshot(self):
+        """
+        Write the current frame as an Arrow snapshot (once per version) and return it memory-mapped.
+        """
+        path = os.path.join(self.cache_dir, f"{SNAPSHOT_PREFIX}{self.version}.arrow")
+        if not os.path.exists(path):
+            table = pa.Table.from_pandas(self.df, preserve_index=False)
+
+            def write(temp_path):
+                with pa.OSFile(temp_path, 'wb') as file, pa.ipc.new_file(file, table.schema) as writer:
+                    writer.write_table(table)
+
+            _write_replacing(path, write)
+
+        for name in os.listdir(self.cache_dir):
+            if name.startswith(SNAPSHOT_PREFIX) and name != os.path.basename(path):
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                except OSError:
+                    pass  # Still mapped by a frame in use (Windows)
+
+        # split_blocks keeps one block per column, so columns without nulls are not copied
+        return pa.ipc.open_file(pa.memory_map(path)).read_all().to_pandas(split_blocks=True)
+
+    def refresh(self):
+        """
+        Pick up new or changed exports and return the current incident DataFrame.
+        """
+        with self._lock, _cache_lock(self.cache_dir):
+            # Another process may have ingested or dropped exports since our last refresh
+            manifest = self._read_manifest()
+            changed_elsewhere = self.df is not None and _part_names(manifest) != _part_names(self._manifest)
+            self._manifest = manifest
+            new_parts, invalidated = self._scan()
+
+            if self.df is None or invalidated or changed_elsewhere:
+                self._rebuild()
+            elif new_parts:
+                self._append(new_parts)
+            else:
+                return self.df
+
+            self._write_manifest()
+            self.version = hashlib.sha256(
+                json.dumps(sorted((name, entry['sha256']) for name, entry in self._manifest.items())).encode()
+            ).hexdigest()[:16]
+            if self.memory_map:
+                self.df = self._mapped_snapshot()
+
+            # Caches of results derived from the frame are keyed on this version (frameCache.dataset_version)
+            derived(self.df, 'version', lambda df: self.version)
+            return self.df
+
+
+@st.cache_resource(show_spinner="Loading incident data...")
+def _incident_store(data_dir, memory_map):
+    return IncidentStore(data_dir, memory_map=memory_map)
+
+
+@profiled
+def load_incidents(data_dir='', memory_map=None):
+    """
+    Return the incident DataFrame for the JSON exports in data_dir.
+
+    The store is shared by every session of the server process; each call only
+    parses exports that were added or modified since the previous one. The frame is
+    shared too and already typed: callers read it (or its rollup) and never modify it.
+    With memory_map (default: MEMORY_MAP) it is served from a memory-mapped Arrow
+    snapshot, see IncidentStore.
+    """
+    memory_map = MEMORY_MAP if memory_map is None else memory_map
+    df = _incident_store(data_dir, memory_map).refresh()
+
+    # Build the daily rollup with the data, so the first render does not pay for it
+    incident_cube(df)
+    return df
@@ -0,0 +1,99 @@
+import threading
+import tracemalloc
+
+import pandas as pd
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from forecastingModel import MODELS
+from memoryUsage import active_session_ids, memory_report
+from profiler import call_stats, prometheus_text, reset, start_tracing, stop_tracing, tracing_users
+
+_lock = threading.Lock()
+_tracing_sessions = set()  # ids of the sessions holding a profiler tracing reference
+
+
+def _session_id():
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx is not None else None
+
+
+def _set_tracing(session_id, trace):
+    with _lock:
+        if trace == (session_id in _tracing_sessions):
+            return
+        if trace:
+            _tracing_sessions.add(session_id)
+            start_tracing()
+        else:
+            _tracing_sessions.discard(session_id)
+            stop_tracing()
+
+
+def _release_idle_tracing():
+    # A closed tab or expired session never reruns to untick the box: release it once idle
+    active = active_session_ids()
+    with _lock:
+        idle = [session_id for session_id in _tracing_sessions if session_id not in active]
+    for session_id in idle:
+        _set_tracing(session_id, False)
+
+
+def release_tracing():
+    """
+    Release the tracing reference of the current session, for pages shown without the panel,
+    and those of the sessions gone idle.
+    """
+    _set_tracing(_session_id(), False)
+    _release_idle_tracing()
+
+
+def _mib(value):
+    return "n/a" if value is None else f"{value / 2**20:,.1f} MiB"
+
+
+def debug_panel(df):
+    """
+    Server diagnostics, shown at the bottom of the page when the URL has ?debug=1.
+    """
+    with st.expander("Debug", expanded=True):
+        report = memory_report(df)
+        st.markdown("**Memory**")
+        columns = st.columns(4)
+        columns[0].metric("Resident (process)", _mib(report['resident_bytes']))
+        columns[1].metric("Incident frame (shared)", _mib(report['frame_bytes']))
+        columns[2].metric("Active sessions", report['sessions'])
+        columns[3].metric("Resident added per session", _mib(report['resident_bytes_added_per_session']),
+                          help="Slope of the resident memory against the number of active sessions")
+
+        st.markdown("**Profiled calls** (every session since the last reset)")
+        # tracemalloc slows every allocation of every session down, so it only runs while
+        # some active viewer has this box ticked; each ticked session holds one profiler
+        # reference, released when it unticks, leaves the panel or goes idle
+        trace = st.checkbox("Trace allocations", key="debug_trace_allocations")
+        _set_tracing(_session_id(), trace)
+        _release_idle_tracing()
+        if tracemalloc.is_tracing():
+            st.caption(f"Allocation tracing is on for the whole server ({tracing_users()} user(s)).")
+
+        stats = pd.DataFrame.from_dict(call_stats(), orient='index')
+        if stats.empty:
+            st.caption("No profiled calls yet.")
+        else:
+            st.dataframe(stats.sort_values('total_ms', ascending=False), width='stretch')
+
+        st.markdown("**Forecasting models** (loaded in this process)")
+        models = pd.DataFrame.from_dict(MODELS.stats(), orient='index')
+        if models.empty:
+            st.caption("No model loaded yet.")
+        else:
+            models['memory_kib'] = models.pop('memory_bytes').astype(float) / 1024  # None: not traced
+            models['file_kib'] = models.pop('file_bytes') / 1024
+            st.dataframe(models.drop(columns='mtime_ns'), width='stretch')
+
+        columns = st.columns([1, 1, 4])
+        columns[0].download_button("Prometheus export", data=prometheus_text, file_name="sre_dashboard.prom",
+                                   mime="text/plain", on_click='ignore', key="debug_prometheus")
+        if columns[1].button("Reset", key="debug_reset"):
+            reset()
+            st.rerun()
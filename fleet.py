@@ -0,0 +1,50 @@
+import streamlit as st
+from frameCache import dataset_version
+from lruCache import LRUCache
+from metricsFunc import compute_fleet_metrics
+from periodWindow import METRIC_RANGES
+
+# Risk level colours, as used by assess_risk
+RISK_COLORS = {'High': 'red', 'Medium': 'orange', 'Low': 'green'}
+
+# Fleet tables by (dataset version, metrics range), kept while the tab is hidden
+FLEET_CACHE = LRUCache(maxsize=16)
+
+
+# Function to display the Fleet page content
+def fleet(df):
+    col1, col2 = st.columns([1, 3])
+
+    with col1:
+        # Dropdown for selecting metrics range
+        selected_metric = st.selectbox("Select Metrics Range", METRIC_RANGES, index=0, key="metric_fleet",
+                                       persist_state="session")
+
+    # Metrics of every app, computed in one pass
+    fleet_metrics = FLEET_CACHE.get_or_create((dataset_version(df), selected_metric),
+                                              lambda: compute_fleet_metrics(df, selected_metric))
+
+    with col2:
+        high_risk = (fleet_metrics['risk'] == 'High').sum()
+        st.markdown(f"**{len(fleet_metrics)}** applications, **{high_risk}** at high risk")
+
+    fleet_table = fleet_metrics.drop(columns='appId').rename(columns={
+        'app_display': 'Application',
+        'current_incidents': 'Total Incidents',
+        'previous_incidents': 'Previous Period',
+        'delta_incidents': 'Delta',
+        'percentage_change': 'Change (%)',
+        'average_downtime': 'Average Downtime (minutes)',
+        'risk': 'Risk',
+    })
+
+    # Sortable table: click a column header to sort by it
+    st.dataframe(
+        fleet_table.style.map(lambda level: f"color: {RISK_COLORS[level]}", subset=['Risk']),
+        width='stretch',
+        hide_index=True,
+        column_config={
+            'Change (%)': st.column_config.NumberColumn(format="%+.2f%%"),
+            'Average Downtime (minutes)': st.column_config.NumberColumn(format="%.2f"),
+        },
+    )
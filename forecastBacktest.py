@@ -0,0 +1,164 @@
+"""
+Backtest incident forecasts over rolling origins and score every alarm threshold.
+
+Each fold fits the model on the days before its origin and forecasts the next
+--horizon days; the folds run in parallel. Every threshold is scored on all folds
+at once: hit rate (incident days alarmed), false alarms (alarms on days without
+incidents) and lead time (days between the origin and the alarmed incident). Fit and
+predict latency and the peak memory of the worker are reported per fold.
+
+The series is the training data of the bundled model by default, or any series of
+the incident data with --series:
+
+    python forecastBacktest.py --folds 12 --horizon 14
+    python forecastBacktest.py --series B6OV "Auto Bridge" "Operational Issues" --order 2 0 1
+"""
+import argparse
+import os
+import pickle
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from dataLoader import IncidentStore
+from forecastTraining import ORDER, SEASONAL_ORDER, incident_series
+from forecastingModel import INCIDENT_THRESHOLD, MODEL_FILE
+from workerPool import import_statsmodels, measured, process_pool
+
+# Alarm thresholds scored by default
+THRESHOLDS = np.round(np.arange(0.05, 1.0, 0.05), 2)
+
+FOLDS = 8
+HORIZON_DAYS = 14
+
+# Days of history the first fold is fitted on, at least
+MIN_TRAIN_DAYS = 365
+
+
+def fold_origins(n_days, folds=FOLDS, horizon=HORIZON_DAYS, min_train_days=MIN_TRAIN_DAYS):
+    """
+    Day numbers of the fold origins: consecutive horizons ending on the last day.
+    """
+    origins = n_days - horizon * np.arange(folds, 0, -1)
+    return origins[origins >= min_train_days]
+
+
+def run_fold(values, first_day, origin, horizon, order, seasonal_order):
+    """
+    Fit on the days before origin and forecast horizon days from it.
+    """
+    from statsmodels.tsa.statespace.sarimax import SARIMAX
+
+    endog = pd.Series(values[:origin], index=pd.date_range(first_day, periods=origin, freq='D'), dtype=float)
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        results, fit_seconds, _ = measured(
+            lambda: SARIMAX(endog, order=order, seasonal_order=seasonal_order).fit(disp=False))
+    predicted, predict_seconds, peak_rss_bytes = measured(
+        lambda: results.get_forecast(horizon).predicted_mean.to_numpy())
+
+    return predicted, {'fit_seconds': fit_seconds, 'predict_seconds': predict_seconds,
+                       'peak_rss_bytes': peak_rss_bytes}
+
+
+def score_thresholds(predicted, actual, thresholds=THRESHOLDS):
+    """
+    Score every threshold on the (fold x day) predicted values against the actual 0/1 days.
+    """
+    actual = actual.astype(bool)
+    alarms = predicted[np.newaxis] >= np.asarray(thresholds)[:, np.newaxis, np.newaxis]
+    hits = alarms & actual
+    lead_days = np.arange(1, predicted.shape[1] + 1)
+
+    hit_count = hits.sum(axis=(1, 2))
+    alarm_count = alarms.sum(axis=(1, 2))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return pd.DataFrame({
+            'alarms': alarm_count,
+            'hits': hit_count,
+            'false_alarms': alarm_count - hit_count,
+            'hit_rate': hit_count / actual.sum(),
+            'false_alarm_share': (alarm_count - hit_count) / alarm_count,
+            'mean_lead_days': (hits * lead_days).sum(axis=(1, 2)) / hit_count,
+        }, index=pd.Index(thresholds, name='threshold'))
+
+
+def backtest(values, first_day, folds=FOLDS, horizon=HORIZON_DAYS, order=ORDER, seasonal_order=SEASONAL_ORDER,
+             thresholds=THRESHOLDS, workers=None, min_train_days=MIN_TRAIN_DAYS):
+    """
+    Backtest the daily 0/1 series values (starting on first_day) over rolling origins.
+
+    Returns the score of every threshold and the latency and memory of every fold.
+    """
+    values = np.asarray(values, dtype=float)
+    origins = fold_origins(len(values), folds, horizon, min_train_days)
+    if not len(origins):
+        raise ValueError(f"{len(values)} days are too few for a {horizon}-day fold after {min_train_days} days")
+
+    workers = min(workers or os.cpu_count() or 1, len(origins))
+    with process_pool(workers, import_statsmodels) as pool:
+        results = list(pool.map(run_fold, [values] * len(origins), [first_day] * len(origins), origins,
+                                [horizon] * len(origins), [order] * len(origins), [seasonal_order] * len(origins)))
+
+    predicted = np.vstack([fold_predicted for fold_predicted, _ in results])
+    actual = np.vstack([values[origin:origin + horizon] for origin in origins])
+    folds_stats = pd.DataFrame([stats for _, stats in results],
+                               index=pd.DatetimeIndex(first_day + pd.to_timedelta(origins, unit='D'), name='origin'))
+    folds_stats['incident_days'] = actual.sum(axis=1).astype(int)
+    return score_thresholds(predicted, actual, thresholds), folds_stats
+
+
+def model_series(model_file=MODEL_FILE):
+    """
+    Training data and orders of a pickled model, as (values, first day, order, seasonal order).
+    """
+    with open(model_file, 'rb') as file:
+        model = pickle.load(file).model
+    return np.asarray(model.endog).ravel(), model.data.row_labels[0], model.order, model.seasonal_order
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--model', default=MODEL_FILE, help="pickled model whose training data is replayed")
+    parser.add_argument('--series', nargs=3, metavar=('APP_ID', 'SOURCE', 'CATEGORY'),
+                        help="replay this series of the incident data instead")
+    parser.add_argument('--data-dir', default='', help="directory of the JSON exports (with --series)")
+    parser.add_argument('--folds', type=int, default=FOLDS)
+    parser.add_argument('--horizon', type=int, default=HORIZON_DAYS, help="days forecast from each origin")
+    parser.add_argument('--min-train-days', type=int, default=MIN_TRAIN_DAYS)
+    parser.add_argument('--order', type=int, nargs=3, help="SARIMA (p, d, q) (default: the model's)")
+    parser.add_argument('--seasonal-order', type=int, nargs=4, help="SARIMA (P, D, Q, s) (default: the model's)")
+    parser.add_argument('--workers', type=int, help="worker processes (default: one per CPU)")
+    args = parser.parse_args()
+
+    if args.series:
+        keys, matrix, first_day = incident_series(IncidentStore(args.data_dir).refresh(), 1)
+        key = tuple(None if part in ('', '(none)') else part for part in args.series)
+        if key not in keys:
+            raise SystemExit(f"No incidents for series {' / '.join(args.series)}")
+        values, order, seasonal_order = matrix[keys.index(key)], ORDER, SEASONAL_ORDER
+    else:
+        values, first_day, order, seasonal_order = model_series(args.model)
+    order = tuple(args.order or order)
+    seasonal_order = tuple(args.seasonal_order or seasonal_order)
+
+    started = time.perf_counter()
+    scores, folds = backtest(values, first_day, args.folds, args.horizon, order, seasonal_order,
+                             workers=args.workers, min_train_days=args.min_train_days)
+    print(f"SARIMA{order}x{seasonal_order}: {len(folds)} folds of {args.horizon} days "
+          f"in {time.perf_counter() - started:.1f} s, {folds['incident_days'].sum()} incident days")
+    print(f"fit {folds['fit_seconds'].mean():.2f} s mean / {folds['fit_seconds'].max():.2f} s max, "
+          f"predict {folds['predict_seconds'].mean() * 1000:.1f} ms mean, "
+          f"worker peak RSS {folds['peak_rss_bytes'].max() / 2**20:.1f} MiB")
+    print(scores.to_string(float_format=lambda value: f"{value:.3f}"))
+    if INCIDENT_THRESHOLD in scores.index:
+        current = scores.loc[INCIDENT_THRESHOLD]
+        print(f"current threshold {INCIDENT_THRESHOLD}: hit rate {current['hit_rate']:.3f}, "
+              f"{int(current['false_alarms'])} false alarms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,296 @@
+"""
+Train one SARIMA model per incident series, every (appId, source, category) combination.
+
+A series is the daily indicator of at least one incident, built from the same incident
+frame the dashboard loads. Series are fitted in a process pool and published as a new
+version of the model store, with the fit time of every series and the peak memory of
+the worker that fitted it.
+
+With --update, the days added since the current version are appended to its models
+with their fitted parameters (no re-estimation); a full refit only runs once the last
+one is --refit-days old, or when there is no version to update yet.
+
+    python forecastTraining.py --data-dir exports/ --workers 8
+    python forecastTraining.py --apps B6OV A1B2 --min-incidents 30
+    python forecastTraining.py --update --refit-days 7
+"""
+import argparse
+import os
+import pickle
+import shutil
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from compactModel import compact_path, export_compact
+from dataLoader import IncidentStore
+from frameCache import dataset_version
+from modelStore import STORE, series_label
+from workerPool import import_statsmodels, measured, process_pool
+
+# Columns identifying a series; category is left empty for exports without one
+SERIES_COLUMNS = ['appId', 'source', 'category']
+
+# Orders of the fitted SARIMA models: weekly seasonality on daily data
+ORDER = (1, 0, 1)
+SEASONAL_ORDER = (1, 0, 1, 7)
+
+# Series with fewer incidents are not worth a model
+MIN_INCIDENTS = 10
+
+# Days of new data after which --update re-estimates the models instead of appending to them
+REFIT_DAYS = 7
+
+
+def incident_series(df, min_incidents=MIN_INCIDENTS, app_ids=None):
+    """
+    Build the daily incident indicator of every series with at least min_incidents incidents.
+
+    Returns the series keys, a (series x day) uint8 matrix and the date of its first column,
+    which spans the whole dataset for every series.
+    """
+    dated = df[df['date'].notna()]
+    columns = [column for column in SERIES_COLUMNS if column in dated.columns]
+    grouped = dated.groupby(columns, observed=True, dropna=False, sort=True)
+    sizes = grouped.size()
+    codes = grouped.ngroup().to_numpy()
+
+    keys = [tuple(None if pd.isna(part) else str(part) for part in (key if isinstance(key, tuple) else (key,)))
+            + (None,) * (len(SERIES_COLUMNS) - len(columns)) for key in sizes.index]
+    keep = sizes.to_numpy() >= min_incidents
+    if app_ids:
+        keep &= np.isin([key[0] for key in keys], list(app_ids))
+
+    days = dated['date'].dt.normalize()
+    first_day = days.min()
+    day_numbers = ((days - first_day) // pd.Timedelta(days=1)).to_numpy()
+
+    # Rows of the kept series in the matrix, -1 for the others
+    rows = np.full(len(keys), -1)
+    rows[keep] = np.arange(keep.sum())
+    incident_rows = rows[codes]
+    kept = incident_rows >= 0
+
+    matrix = np.zeros((keep.sum(), day_numbers.max() + 1 if len(day_numbers) else 0), dtype=np.uint8)
+    matrix[incident_rows[kept], day_numbers[kept]] = 1
+    return [key for key, kept_key in zip(keys, keep) if kept_key], matrix, first_day
+
+
+def _daily_series(values, first_day):
+    return pd.Series(values, index=pd.date_range(first_day, periods=len(values), freq='D'), dtype=float)
+
+
+def _write_model(path, results):
+    # The pickle is kept for --update; the dashboard serves the compact export next to it
+    data = pickle.dumps(results)
+    with open(path + '.tmp', 'wb') as file:
+        file.write(data)
+    os.replace(path + '.tmp', path)
+    export_compact(results, compact_path(path))
+    return {'model_bytes': len(data), 'compact_bytes': os.path.getsize(compact_path(path))}
+
+
+def fit_series(path, values, first_day, order=ORDER, seasonal_order=SEASONAL_ORDER):
+    """
+    Fit the model of one series, pickle it to path and return its fit statistics.
+    """
+    from statsmodels.tsa.statespace.sarimax import SARIMAX
+
+    endog = _daily_series(values, first_day)
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        results, fit_seconds, peak_rss_bytes = measured(
+            lambda: SARIMAX(endog, order=order, seasonal_order=seasonal_order).fit(disp=False))
+
+    return {
+        'fit_seconds': round(fit_seconds, 4),
+        'peak_rss_bytes': peak_rss_bytes,
+        'converged': bool(results.mle_retvals.get('converged', True)),
+        **_write_model(path, results),
+    }
+
+
+def update_series(source_path, path, values, first_day):
+    """
+    Append the observations in values (starting on first_day) to the model pickled at
+    source_path, keeping its fitted parameters, and pickle the result to path.
+    """
+    with open(source_path, 'rb') as file:
+        results = pickle.load(file)
+
+    started = time.perf_counter()
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        results = results.append(_daily_series(values, first_day), refit=False)
+    update_seconds = time.perf_counter() - started
+
+    return {'update_seconds': round(update_seconds, 4), **_write_model(path, results)}
+
+
+def _run_pool(store, version, workers, function, *iterables):
+    """
+    Map function over iterables in a process pool writing into version of store.
+
+    Returns the results, the worker count and the wall seconds; the version folder is
+    removed if anything fails.
+    """
+    workers = min(workers or os.cpu_count() or 1, len(iterables[0])) or 1
+
+    started = time.perf_counter()
+    try:
+        with process_pool(workers, import_statsmodels) as pool:
+            results = list(pool.map(function, *iterables))
+    except BaseException:
+        # Never leave a half-written version behind
+        shutil.rmtree(os.path.join(store.root, version), ignore_errors=True)
+        raise
+    return results, workers, round(time.perf_counter() - started, 2)
+
+
+def train_models(df, store=STORE, workers=None, min_incidents=MIN_INCIDENTS, app_ids=None,
+                 order=ORDER, seasonal_order=SEASONAL_ORDER):
+    """
+    Fit a model for every series of df and publish them as a new version of store.
+
+    Returns the published manifest.
+    """
+    keys, matrix, first_day = incident_series(df, min_incidents, app_ids)
+    if not keys:
+        raise ValueError(f"No series with at least {min_incidents} incidents")
+
+    version = store.new_version()
+    files = [store.model_file(key) for key in keys]
+    paths = [store.path(version, file_name) for file_name in files]
+    stats, workers, wall_seconds = _run_pool(store, version, workers, fit_series, paths, matrix,
+                                             [first_day] * len(keys), [order] * len(keys),
+                                             [seasonal_order] * len(keys))
+
+    last_day = (first_day + pd.Timedelta(days=matrix.shape[1] - 1)).strftime('%Y-%m-%d')
+    manifest = {
+        'trained_at': pd.Timestamp.now().isoformat(timespec='seconds'),
+        'dataset_version': dataset_version(df),
+        'first_day': first_day.strftime('%Y-%m-%d'),
+        'last_day': last_day,
+        'refit_day': last_day,
+        'order': list(order),
+        'seasonal_order': list(seasonal_order),
+        'workers': workers,
+        'wall_seconds': wall_seconds,
+        'series': [dict(key=list(key), file=file_name, incident_days=int(row.sum()), **series_stats)
+                   for key, file_name, row, series_stats in zip(keys, files, matrix, stats)],
+    }
+    return store.publish(version, manifest)
+
+
+def update_models(df, store=STORE, workers=None, refit_days=REFIT_DAYS, min_incidents=MIN_INCIDENTS,
+                  app_ids=None):
+    """
+    Bring the current version of store up to date with df and publish the result.
+
+    The days after the version's last day are appended to every model without
+    re-estimating its parameters; series that reached min_incidents since are fitted.
+    Runs train_models instead when there is no version yet, when the last full fit is
+    refit_days old, or when df starts earlier than the version. Incidents backfilled
+    into days a version already covers are only picked up by the next full refit.
+
+    Returns the published manifest, or the current one when df has no new days.
+    """
+    manifest = store.manifest()
+    keys, matrix, first_day = incident_series(df, 1)
+    last_day = first_day + pd.Timedelta(days=matrix.shape[1] - 1)
+    if manifest is None or first_day != pd.Timestamp(manifest['first_day']) \
+            or last_day - pd.Timestamp(manifest['refit_day']) >= pd.Timedelta(days=refit_days):
+        order, seasonal_order = (ORDER, SEASONAL_ORDER) if manifest is None \
+            else (tuple(manifest['order']), tuple(manifest['seasonal_order']))
+        return train_models(df, store, workers, min_incidents, app_ids, order, seasonal_order)
+
+    known_days = (pd.Timestamp(manifest['last_day']) - first_day).days + 1
+    if matrix.shape[1] <= known_days:
+        return manifest
+
+    rows = {key: row for key, row in zip(keys, matrix)}
+    no_incidents = np.zeros(matrix.shape[1], dtype=np.uint8)
+    entries = manifest['series']
+    known = store.series()
+    new_keys = [key for key, row in rows.items() if key not in known and row.sum() >= min_incidents
+                and (not app_ids or key[0] in app_ids)]
+
+    version = store.new_version()
+    first_new_day = first_day + pd.Timedelta(days=known_days)
+    update_stats, workers, wall_seconds = _run_pool(
+        store, version, workers, update_series,
+        [store.path(manifest['version'], entry['file']) for entry in entries],
+        [store.path(version, entry['file']) for entry in entries],
+        [rows.get(tuple(entry['key']), no_incidents)[known_days:] for entry in entries],
+        [first_new_day] * len(entries))
+    series = [dict(entry, incident_days=int(rows.get(tuple(entry['key']), no_incidents).sum()), **stats)
+              for entry, stats in zip(entries, update_stats)]
+
+    if new_keys:
+        files = [store.model_file(key) for key in new_keys]
+        fit_stats, _, fit_seconds = _run_pool(
+            store, version, workers, fit_series, [store.path(version, file_name) for file_name in files],
+            [rows[key] for key in new_keys], [first_day] * len(new_keys),
+            [tuple(manifest['order'])] * len(new_keys), [tuple(manifest['seasonal_order'])] * len(new_keys))
+        wall_seconds += fit_seconds
+        series += [dict(key=list(key), file=file_name, incident_days=int(rows[key].sum()), **stats)
+                   for key, file_name, stats in zip(new_keys, files, fit_stats)]
+
+    return store.publish(version, dict(
+        manifest,
+        updated_at=pd.Timestamp.now().isoformat(timespec='seconds'),
+        dataset_version=dataset_version(df),
+        last_day=last_day.strftime('%Y-%m-%d'),
+        workers=workers,
+        wall_seconds=wall_seconds,
+        series=series,
+    ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--data-dir', default='', help="directory of the JSON exports (default: current)")
+    parser.add_argument('--apps', nargs='*', help="appIds to train (default: every app)")
+    parser.add_argument('--min-incidents', type=int, default=MIN_INCIDENTS, help="skip series with fewer incidents")
+    parser.add_argument('--workers', type=int, help="worker processes (default: one per CPU)")
+    parser.add_argument('--update', action='store_true', help="append new days to the current models")
+    parser.add_argument('--refit-days', type=int, default=REFIT_DAYS,
+                        help="with --update, days of new data after which the models are refitted")
+    args = parser.parse_args()
+
+    df = IncidentStore(args.data_dir).refresh()
+    if args.update:
+        current = STORE.current_version()
+        manifest = update_models(df, workers=args.workers, refit_days=args.refit_days,
+                                 min_incidents=args.min_incidents, app_ids=args.apps)
+        if manifest['version'] == current:
+            print(f"version {current} is up to date")
+            return
+    else:
+        manifest = train_models(df, workers=args.workers, min_incidents=args.min_incidents, app_ids=args.apps)
+
+    series = pd.DataFrame(manifest['series'])
+    series['series'] = series['key'].map(series_label)
+    updated = manifest['refit_day'] != manifest['last_day']
+    print(f"{len(series)} series {'updated' if updated else 'trained'} in {manifest['wall_seconds']:.1f} s "
+          f"with {manifest['workers']} workers, published as version {manifest['version']}")
+    if updated:
+        print(f"appended the days up to {manifest['last_day']} to the fit of {manifest['refit_day']}: "
+              f"{series['update_seconds'].sum():.2f} s in total, {series['update_seconds'].max():.2f} s max")
+    print(f"fit time{' at the last full fit' if updated else ''}: {series['fit_seconds'].sum():.1f} s in total, {series['fit_seconds'].mean():.2f} s mean, "
+          f"{series['fit_seconds'].max():.2f} s max")
+    if 'peak_rss_bytes' in series and series['peak_rss_bytes'].notna().any():
+        print(f"worker peak RSS: {series['peak_rss_bytes'].max() / 2**20:.1f} MiB")
+    print(f"models: {series['model_bytes'].sum() / 2**20:.1f} MiB on disk, "
+          f"{series['compact_bytes'].sum() / 2**20:.2f} MiB served")
+    if not series['converged'].all():
+        print(f"{(~series['converged']).sum()} fits did not converge")
+    print(series.nlargest(5, 'fit_seconds')[['series', 'incident_days', 'fit_seconds']]
+          .to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from forecastingModel import MODEL_FILE, model_file_version, prediction
+from lruCache import LRUCache
+
+# Threads computing forecasts; model loads and predictions run on them, never on the page's script
+FORECAST_WORKERS = 2
+
+
+class ForecastWorker:
+    """
+    Background job queue for prediction(), shared by every session.
+
+    request() returns at once with the future of the job. Requests for the same model
+    version and date range share one job while it runs, and its result stays cached
+    afterwards; failed jobs are dropped so that the next request retries.
+    """
+
+    def __init__(self, workers=FORECAST_WORKERS, maxsize=256):
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='forecast')
+        self._lock = threading.Lock()
+        self.jobs = LRUCache(maxsize)  # key -> Future, running or done
+
+    def request(self, start_date, end_date, model_file=MODEL_FILE):
+        """
+        Return the future of the predicted incident dates between start_date and end_date.
+        """
+        # The mtimes of the model and its compact export version the model without loading it here
+        key = (model_file, model_file_version(model_file), str(start_date), str(end_date))
+        with self._lock:
+            job = self.jobs.get_or_create(key, lambda: self._pool.submit(prediction, start_date, end_date, model_file))
+
+        # The caller reports the failure; the next request starts over
+        if job.done() and job.exception() is not None:
+            self.jobs.discard(key)
+        return job
+
+
+FORECASTS = ForecastWorker()
@@ -1,6 +1,26 @@
 import streamlit as st
 import pandas as pd
-from forecastingModel import prediction
+from forecastingModel import MODEL_FILE
+from forecastWorker import FORECASTS
+from modelStore import STORE
+
+
+def select_series(series):
+    """
+    Pick an (appId, source, category) series of the trained models, one selectbox per part.
+    """
+    apps = sorted({key[0] for key in series})
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        app_id = st.selectbox("Application", apps, key="forecasting_app", persist_state="session")
+    with col2:
+        sources = sorted({key[1] or '' for key in series if key[0] == app_id})
+        source = st.selectbox("Source", sources, key="forecasting_source", persist_state="session") or None
+    with col3:
+        categories = sorted({key[2] or '' for key in series if key[:2] == (app_id, source)})
+        category = st.selectbox("Category", categories, format_func=lambda name: name or "(none)",
+                                key="forecasting_category", persist_state="session") or None
+    return app_id, source, category
 
 def forecasting():
 
@@ -9,7 +29,8 @@ def forecasting():
 
         with col1:
             # Date range selection
-            date_range = st.date_input("Select Date Range", [], key="forecasting_date_range_key")
+            date_range = st.date_input("Select Date Range", [], key="forecasting_date_range_key",
+                                       persist_state="session")
             if date_range:
                 if len(date_range) == 2:
                     start_date, end_date = date_range
@@ -18,35 +39,63 @@ def forecasting():
             else:
                 start_date = end_date = None
 
-        with col2:
-            st.markdown("""
-                <h3 style='font-size: 20px; display: inline; margin-left: 10px;'>Source:</h3>
-                <span style='font-size: 18px; display: inline; margin-left: 10px;'>Auto Bridge</span>
-            """, unsafe_allow_html=True)
+        # Models trained per series by forecastTraining.py; without them, the bundled model
+        series = STORE.series()
+        if series:
+            with col2.container():
+                key = select_series(series)
+            model_file = STORE.model_path(key)
+        else:
+            model_file = MODEL_FILE
+            with col2:
+                st.markdown("""
+                    <h3 style='font-size: 20px; display: inline; margin-left: 10px;'>Source:</h3>
+                    <span style='font-size: 18px; display: inline; margin-left: 10px;'>Auto Bridge</span>
+                """, unsafe_allow_html=True)
 
-        with col3:
-            st.markdown("""
-                <h3 style='font-size: 20px; display: inline; margin: 0;'>Category:</h3>
-                <span style='font-size: 18px; display: inline; margin-left: 2px;'>Operational Issues</span>
-            """, unsafe_allow_html=True)
+            with col3:
+                st.markdown("""
+                    <h3 style='font-size: 20px; display: inline; margin: 0;'>Category:</h3>
+                    <span style='font-size: 18px; display: inline; margin-left: 2px;'>Operational Issues</span>
+                """, unsafe_allow_html=True)
 
     if start_date and end_date:
         with st.container():
-            # Generate the list of dates using the prediction function
-            list_of_dates = prediction(start_date, end_date)
+            # Predictions run on the background worker; the page shows them once they are ready
+            job = FORECASTS.request(start_date, end_date, model_file)
+            if job.done():
+                show_predictions(job)
+            else:
+                st.fragment(wait_for_predictions, run_every=0.5)(job)
 
-            if list_of_dates:
-                # Create a DataFrame for tabular display
-                df = pd.DataFrame(list_of_dates, columns=["Predicted Dates"])
 
-                # Add a serial number column
-                df.insert(0, 'S.No', range(1, len(df) + 1))
+def wait_for_predictions(job):
+    # Polls without re-running the rest of the page, which stays usable meanwhile
+    if job.done():
+        st.rerun()
+    st.info("Forecasting the selected date range...")
 
-                # Reset the index to remove the default index column
-                df.reset_index(drop=True, inplace=True)
 
-                # Display the DataFrame as a table
-                st.write("Predicted Dates:")
-                st.dataframe(df, use_container_width=True, hide_index=True)
-            else:
-                st.write("No predictions available for the selected date range.")  # Handle case when no predictions are returned
+def show_predictions(job):
+    if job.exception() is not None:
+        st.error(f"Forecasting failed: {job.exception()}")
+        return
+
+    # The list of predicted incident dates
+    list_of_dates = job.result()
+
+    if list_of_dates:
+        # Create a DataFrame for tabular display
+        df = pd.DataFrame(list_of_dates, columns=["Predicted Dates"])
+
+        # Add a serial number column
+        df.insert(0, 'S.No', range(1, len(df) + 1))
+
+        # Reset the index to remove the default index column
+        df.reset_index(drop=True, inplace=True)
+
+        # Display the DataFrame as a table
+        st.write("Predicted Dates:")
+        st.dataframe(df, use_container_width=True, hide_index=True)
+    else:
+        st.write("No predictions available for the selected date range.")  # Handle case when no predictions are returned
@@ -1,30 +1,208 @@
+import io
+import os
 import pickle
+import threading
+import time
+import tracemalloc
 
-def prediction(start_date, end_date):
-    with open('sarima_auto_bridge_opn_issues.pkl', 'rb') as file:
-        model = pickle.load(file)
+import pandas as pd
 
-    # Specify the start and end dates for the forecast and call the loaded model to get the confidences
+from compactModel import COMPACT_SUFFIX, CompactModel, compact_path
+from profiler import count_rows, profiled, start_tracing, stop_tracing
 
-    # start_date = '2025-04-01'
-    # end_date = '2025-04-30'
+# Pickled statsmodels results of the "Auto Bridge / Operational Issues" model
+MODEL_FILE = 'sarima_auto_bridge_opn_issues.pkl'
 
-    # Forecast between the given dates
-    forecast = model.get_prediction(start=start_date, end=end_date)
+# Days past the end of the training data that are forecast ahead of time
+FORECAST_HORIZON_DAYS = 365
 
-    # Retrieve the predicted mean values
-    forecast_values = forecast.predicted_mean
+# A predicted value at or above this threshold means an incident is expected that day
+INCIDENT_THRESHOLD = 0.25
 
-    # Optionally, get confidence intervals
-    # conf_int = forecast.conf_int()
+# Set this environment variable to 1 to trace the loads of pickled models with tracemalloc and
+# report their memory footprint (slows the loads down); compact models are always measured
+MEASURE_LOAD_MEMORY_VARIABLE = 'SRE_DASHBOARD_MEASURE_MODEL_MEMORY'
+MEASURE_LOAD_MEMORY = os.environ.get(MEASURE_LOAD_MEMORY_VARIABLE) == '1'
 
-    # print(forecast_values)
-    # print(conf_int)
 
-    # We shall take a threshold of 0.25 and anything above it would mean the incident would happen
-    forecast_yn = forecast_values.apply(lambda x: 1 if x >= 0.25 else 0)
+class ModelRegistry:
+    """
+    Process-wide cache of unpickled forecasting models, shared by every session.
+
+    A model is loaded on first use and reloaded only when its file's mtime changes.
+    A pickled model is served from its compact export (compactModel.py) when one at
+    least as recent sits next to it, so serving does not import statsmodels.
+    stats() reports the load time and memory footprint of every loaded model; the
+    footprint of a pickled model is only known when its load was traced (MEASURE_LOAD_MEMORY).
+    """
+
+    def __init__(self):
+        self._models = {}  # path -> (mtime_ns, model, stats)
+        self._load_lock = threading.Lock()
+
+    @staticmethod
+    def serving_path(path):
+        compact = compact_path(path)
+        if compact != path and os.path.exists(compact) and os.stat(compact).st_mtime_ns >= os.stat(path).st_mtime_ns:
+            return compact
+        return path
+
+    def get(self, path):
+        path = self.serving_path(path)
+        mtime = os.stat(path).st_mtime_ns
+        entry = self._models.get(path)
+        if entry and entry[0] == mtime:
+            return entry[1]
+
+        # One load at a time: other callers wait for it instead of unpickling again
+        with self._load_lock:
+            entry = self._models.get(path)
+            if entry and entry[0] == mtime:
+                return entry[1]
+            model, stats = self._load(path)
+            stats['loads'] = (entry[2]['loads'] if entry else 0) + 1
+            self._models[path] = (mtime, model, stats)
+            return model
+
+    def version(self, path):
+        """
+        mtime of the loaded copy of path, identifying the model for caches of its results.
+        """
+        self.get(path)
+        return self._models[self.serving_path(path)][0]
+
+    @staticmethod
+    def _load(path):
+        with open(path, 'rb') as file:
+            data = file.read()
+
+        # A compact model's footprint is its arrays. For a pickle it is the traced memory the
+        # one load keeps; tracing slows the load down, so it is only measured on request or
+        # while tracemalloc already traces
+        compact = path.endswith(COMPACT_SUFFIX)
+        trace = MEASURE_LOAD_MEMORY and not compact
+        if trace:
+            start_tracing()
+        before = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else None
+        started = time.perf_counter()
+        model = CompactModel.load(io.BytesIO(data)) if compact else pickle.loads(data)
+        load_seconds = time.perf_counter() - started
+        memory_bytes = tracemalloc.get_traced_memory()[0] - before if before is not None else None
+        if trace:
+            stop_tracing()
+        if compact:
+            memory_bytes = model.nbytes
+
+        return model, {'load_seconds': load_seconds, 'memory_bytes': memory_bytes, 'file_bytes': len(data)}
+
+    def stats(self):
+        """
+        Load time, memory footprint, file size and load count of every loaded model, by path.
+        """
+        return {path: dict(stats, mtime_ns=mtime) for path, (mtime, _, stats) in self._models.items()}
+
+
+MODELS = ModelRegistry()
+
+
+def model_file_version(path=MODEL_FILE):
+    """
+    mtimes of a model file and of its compact export (None without one), without loading it.
+
+    Either may be the copy ModelRegistry serves, so both identify the served model.
+    """
+    try:
+        compact_mtime = os.stat(compact_path(path)).st_mtime_ns
+    except OSError:
+        compact_mtime = None
+    return os.stat(path).st_mtime_ns, compact_mtime
+
+
+def load_model(path=MODEL_FILE):
+    return MODELS.get(path)
+
+
+class ForecastTable:
+    """
+    Predictions of a model precomputed for every day from the start of its training
+    data up to FORECAST_HORIZON_DAYS past its end: mean and 95% confidence interval.
+
+    In-sample days hold the one-step-ahead predictions and later days the forecast
+    from the end of the sample, the same values get_prediction returns for any range.
+    """
+
+    def __init__(self, model, horizon_days=FORECAST_HORIZON_DAYS):
+        forecast = model.get_prediction(start=0, end=model.nobs - 1 + horizon_days)
+        conf_int = forecast.conf_int()
+        self.dates = pd.DatetimeIndex(forecast.predicted_mean.index)
+        self.mean = forecast.predicted_mean.to_numpy()
+        self.lower = conf_int.iloc[:, 0].to_numpy()
+        self.upper = conf_int.iloc[:, 1].to_numpy()
+
+    def covers(self, start_date, end_date):
+        return len(self.dates) > 0 and self.dates[0] <= pd.Timestamp(start_date) \
+            and pd.Timestamp(end_date) <= self.dates[-1]
+
+    def window(self, start_date, end_date):
+        """
+        Predictions from start_date to end_date (inclusive) as a DataFrame indexed by date.
+        """
+        lo = self.dates.searchsorted(pd.Timestamp(start_date), side='left')
+        hi = self.dates.searchsorted(pd.Timestamp(end_date), side='right')
+        return pd.DataFrame({'mean': self.mean[lo:hi], 'lower': self.lower[lo:hi], 'upper': self.upper[lo:hi]},
+                            index=self.dates[lo:hi])
+
+
+_forecast_tables = {}  # (model file, model version) -> ForecastTable, or None for models without daily dates
+_forecast_lock = threading.Lock()
+
+
+def forecast_table(model_file=MODEL_FILE):
+    """
+    Return the precomputed predictions of a model, built once per model version.
+
+    Returns None when the model is not indexed by consecutive days.
+    """
+    key = (model_file, MODELS.version(model_file))
+    with _forecast_lock:
+        if key not in _forecast_tables:
+            model = load_model(model_file)
+            index = model.index if isinstance(model, CompactModel) else getattr(model.model, '_index', None)
+            daily = isinstance(index, pd.DatetimeIndex) and index.freqstr == 'D'
+            for stale in [cached for cached in _forecast_tables if cached[0] == model_file]:
+                del _forecast_tables[stale]
+            _forecast_tables[key] = ForecastTable(model) if daily else None
+        return _forecast_tables[key]
+
+
+def forecast_window(start_date, end_date, model_file=MODEL_FILE):
+    """
+    Predicted mean and confidence interval per day from start_date to end_date.
+
+    Served from the precomputed table; dates outside it are predicted by the live model.
+    """
+    table = forecast_table(model_file)
+    if table is not None and table.covers(start_date, end_date):
+        window = table.window(start_date, end_date)
+        count_rows(len(window))
+        return window
+
+    forecast = load_model(model_file).get_prediction(start=pd.Timestamp(start_date), end=pd.Timestamp(end_date))
+    conf_int = forecast.conf_int()
+    count_rows(len(conf_int))
+    return pd.DataFrame({'mean': forecast.predicted_mean.to_numpy(), 'lower': conf_int.iloc[:, 0].to_numpy(),
+                         'upper': conf_int.iloc[:, 1].to_numpy()}, index=forecast.predicted_mean.index)
+
+
+@profiled
+def prediction(start_date, end_date, model_file=MODEL_FILE, threshold=INCIDENT_THRESHOLD):
+    # Predicted values between the given dates, sliced from the precomputed forecast when possible
+    forecast = forecast_window(start_date, end_date, model_file)['mean']
+
+    # Anything at or above the threshold means the incident would happen
+    incident = forecast.to_numpy() >= threshold
 
     # finally, filter the dates to a list for ease of display.
-    incident_dates = forecast_yn[forecast_yn == 1].index.strftime('%Y-%m-%d').tolist()
+    incident_dates = forecast.index[incident].strftime('%Y-%m-%d').tolist()
 
     return incident_dates
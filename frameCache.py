@@ -0,0 +1,42 @@
+import threading
+import uuid
+import weakref
+
+_lock = threading.Lock()
+
+# id(frame) -> (weak reference to the frame, {name: derived value})
+_derived = {}
+
+
+def derived(df, name, build):
+    """
+    Return build(df), computed once per DataFrame object and shared by every caller.
+
+    The values are dropped once the frame is garbage collected, so a reloaded dataset
+    (a new frame) gets its own structures while reruns on the same data reuse them.
+    The cache holds them strongly: a value that references df itself (rather than a
+    copy, even a shallow one) keeps the frame and all its values alive for good.
+    """
+    key = id(df)
+    with _lock:
+        entry = _derived.get(key)
+        if entry is None or entry[0]() is not df:
+            entry = (weakref.ref(df, lambda _, key=key: _derived.pop(key, None)), {})
+            _derived[key] = entry
+        values = entry[1]
+        if name in values:
+            return values[name]
+
+    value = build(df)
+    with _lock:
+        return values.setdefault(name, value)
+
+
+def dataset_version(df):
+    """
+    Return a string identifying the contents of df, for keying caches of derived results.
+
+    Frames of the incident store carry the store's version; any other frame gets a
+    random version for as long as it lives.
+    """
+    return derived(df, 'version', lambda df: uuid.uuid4().hex[:16])
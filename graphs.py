@@ -1,7 +1,7 @@
 import streamlit as st
 import pandas as pd
 from charts import generate_graph, generate_source_graph, generate_pie_chart, generate_severity_bar_chart
-from metricsFunc import get_total_incidents
+from metricsFunc import get_total_incidents, get_baseline_avg_incidents
 
 def graphs(df):
     # Verify content of app_displays
@@ -11,7 +11,7 @@ def graphs(df):
     default_app_display = "B6OV (My Business Portal)"
 
     # Calculate the baseline average number of incidents using the entire DataFrame
-    baseline_avg_incidents = df.groupby('appId').size().mean()
+    baseline_avg_incidents = get_baseline_avg_incidents(df)
 
     # Create container for dropdowns
     with st.container():
@@ -21,17 +21,18 @@ def graphs(df):
         with col1:
             # Set default appId to "B6OV"
             selected_app_display = st.selectbox("Select App ID", app_displays,
-                                                index=list(app_displays).index(default_app_display), key="appId")
+                                                index=list(app_displays).index(default_app_display), key="appId",
+                                                persist_state="session")
             selected_app_id = selected_app_display.split(' ')[0]
 
         with col2:
             # Set default time range to '3 Months'
             selected_time_range = st.selectbox("Select Time Range", ['3 Months', '6 Months', '1 Year'], index=0,
-                                               key="time_range")
+                                               key="time_range", persist_state="session")
 
         with col3:
             # Date range selection
-            date_range = st.date_input("Select Date Range", [])
+            date_range = st.date_input("Select Date Range", [], key="chart_date_range_key", persist_state="session")
             if date_range:
                 if len(date_range) == 2:
                     start_date, end_date = date_range
@@ -0,0 +1,150 @@
+import numpy as np
+import pandas as pd
+
+from frameCache import derived
+from incidentIndex import app_offsets, incident_index
+from profiler import count_rows
+
+# Dimensions of the daily rollup
+CUBE_KEYS = ['appId', 'day', 'severity', 'source']
+
+
+def build_cube(df):
+    """
+    Roll the incident rows up to one row per (appId, day, severity, source) with the
+    incident count and the sum/count of the non-null durations, sorted by appId and day.
+    The week and month of every day are precomputed for the charts.
+    """
+    count_rows(len(df))
+    # Durations are summed in float64 whatever their stored width
+    rolled = df.assign(day=df['date'].dt.normalize(), duration=df['duration'].astype('float64'),
+                       duration_count=df['duration'].notna())
+    cube = rolled.groupby(CUBE_KEYS, observed=True, dropna=False).agg(
+        count=('date', 'size'),
+        duration_sum=('duration', 'sum'),
+        duration_count=('duration_count', 'sum'),
+    ).reset_index()
+    cube['week'] = cube['day'].dt.to_period('W')
+    cube['month'] = cube['day'].dt.to_period('M')
+    order = np.lexsort((cube['day'].to_numpy(), cube['appId'].cat.codes.to_numpy()))
+    return cube.iloc[order].reset_index(drop=True)
+
+
+class IncidentCube:
+    """
+    Daily rollup of an incident frame answering the metric and chart window queries.
+
+    Whole days come from the rollup. When the frame has time-of-day timestamps, the
+    first and last day of a window may only be partly inside it; those days are
+    counted from the incident rows so the results equal a row-level filter.
+    """
+
+    def __init__(self, df):
+        self._index = incident_index(df)
+        self.current_date = df['date'].max()
+        self.intraday = bool((df['date'].notna() & (df['date'] != df['date'].dt.normalize())).any())
+
+        cube = build_cube(df)
+        self.app_ids = cube['appId'].cat.categories
+        codes = cube['appId'].cat.codes.to_numpy()
+        # Incidents per app code over the whole history
+        self.app_totals = np.bincount(codes[codes >= 0], weights=cube['count'].to_numpy()[codes >= 0],
+                                      minlength=len(self.app_ids)).astype(np.int64)
+
+        # Undated incidents only count towards the totals
+        self.cube = cube[cube['day'].notna()].reset_index(drop=True)
+        self._days = self.cube['day'].to_numpy()
+
+        # Rows of every app are contiguous and sorted by day: keep their [start, end) offsets
+        self._offsets = app_offsets(self.cube['appId'].cat.codes.to_numpy())
+
+        # Day-ordered permutation for windows over every app, built on first use
+        self._fleet_order = None
+        self._fleet_days = None
+
+    def _app_code(self, app_id):
+        return self.app_ids.get_loc(app_id) if app_id in self.app_ids else None
+
+    def app_total(self, app_id):
+        """
+        Number of incidents of app_id over the whole history.
+        """
+        code = self._app_code(app_id)
+        return 0 if code is None else int(self.app_totals[code])
+
+    def has_incidents(self, start, end):
+        """
+        Whether any app has an incident dated from start up to end (inclusive).
+        """
+        return self._index.count(None, start, end) > 0
+
+    def _day_range(self, app_id, first_day, last_day):
+        # Cube rows of app_id (every app when None) for first_day <= day <= last_day
+        if app_id is None:
+            if self._fleet_order is None:
+                self._fleet_order = np.argsort(self._days, kind='stable')
+                self._fleet_days = self._days[self._fleet_order]
+            lo, hi = self._day_bounds(self._fleet_days, first_day, last_day)
+            count_rows(hi - lo)
+            return self.cube.take(self._fleet_order[lo:hi])
+
+        start, end = self._offsets.get(self._app_code(app_id), (0, 0))
+        lo, hi = self._day_bounds(self._days[start:end], first_day, last_day)
+        count_rows(hi - lo)
+        return self.cube.iloc[start + lo:start + hi]
+
+    @staticmethod
+    def _day_bounds(days, first_day, last_day):
+        lo = np.searchsorted(days, first_day.to_datetime64(), side='left')
+        hi = np.searchsorted(days, last_day.to_datetime64(), side='right')
+        return lo, max(lo, hi)
+
+    def _partial_day(self, app_id, start, end, include_end):
+        return build_cube(self._index.window(app_id, start, end, include_end))
+
+    def window(self, app_id, start, end, include_end=True):
+        """
+        Cube rows of app_id (every app when None) for incidents dated from start up
+        to end, end included unless include_end is False.
+        """
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        if not self.intraday:
+            last_day = end if include_end else end - pd.Timedelta(1)
+            return self._day_range(app_id, start, last_day)
+
+        # Days wholly inside the window come from the rollup, the partial edge days from the rows
+        first_full, end_day = start.ceil('D'), end.floor('D')
+        parts = [self._day_range(app_id, first_full, end_day - pd.Timedelta(days=1))]
+        if start < first_full:
+            parts.append(self._partial_day(app_id, start, min(first_full, end), include_end and end < first_full))
+        if end_day >= first_full and (include_end or end > end_day):
+            parts.append(self._partial_day(app_id, end_day, end, include_end))
+        return pd.concat(parts, ignore_index=True)
+
+
+def incident_cube(df):
+    """
+    Return the daily rollup of df, built once per dataset and shared by every caller.
+    """
+    return derived(df, 'cube', IncidentCube)
+
+
+def window_count(cube_rows):
+    return int(cube_rows['count'].sum())
+
+
+def window_value_counts(cube_rows, column):
+    """
+    Incident count per value of column in a window, ordered like Series.value_counts().
+    """
+    return cube_rows.groupby(column, observed=False)['count'].sum().sort_values(ascending=False)
+
+
+def window_mean_duration(cube_rows):
+    """
+    Mean incident duration of a window, 0.0 when the window has no incidents.
+    """
+    if cube_rows['count'].sum() == 0:
+        return 0.0
+    duration_count = cube_rows['duration_count'].sum()
+    return cube_rows['duration_sum'].sum() / duration_count if duration_count else np.nan
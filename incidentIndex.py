@@ -0,0 +1,117 @@
+import numpy as np
+import pandas as pd
+
+from frameCache import derived
+from profiler import count_rows
+
+
+def _sort_keys(df):
+    # Undated incidents get the smallest int64 (NaT), so they sort first and never fall in a window
+    return df['appId'].cat.codes.to_numpy(), df['date'].to_numpy('datetime64[ns]').view('i8')
+
+
+def sort_incidents(df):
+    """
+    Return df ordered by (appId, date), the layout the incident index slices.
+    """
+    codes, dates = _sort_keys(df)
+    order = np.lexsort((dates, codes))
+    if (order == np.arange(len(order))).all():
+        return df
+    return df.take(order).reset_index(drop=True)
+
+
+def app_offsets(codes):
+    """
+    Map every app code of a frame sorted by app to the [start, end) rows it occupies.
+    """
+    if not len(codes):
+        return {}
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    ends = np.r_[starts[1:], len(codes)]
+    return {code: (int(start), int(end)) for code, start, end in zip(codes[starts], starts, ends)}
+
+
+def _bound(value):
+    return pd.Timestamp(value).value
+
+
+class IncidentIndex:
+    """
+    Incident rows sorted by (appId, date) with a per-app offset table.
+
+    A window of one app is found with two binary searches and returned as a
+    slice of the sorted frame instead of a masked copy. Windows over every app
+    go through a date-ordered permutation of the rows, built on first use.
+    """
+
+    def __init__(self, df):
+        rows = sort_incidents(df)
+        # Never keep df itself: the index is cached on df (frameCache.derived) and would keep it alive
+        self.rows = df.copy(deep=False) if rows is df else rows
+        codes, self._dates = _sort_keys(self.rows)
+        self._categories = self.rows['appId'].cat.categories
+        self._offsets = app_offsets(codes)
+        self._fleet_order = None
+        self._fleet_dates = None
+
+    def _app_bounds(self, app_id):
+        if app_id not in self._categories:
+            return 0, 0
+        return self._offsets.get(self._categories.get_loc(app_id), (0, 0))
+
+    def _window_bounds(self, dates, start, end, include_end):
+        lo = np.searchsorted(dates, _bound(start), side='left')
+        hi = np.searchsorted(dates, _bound(end), side='right' if include_end else 'left')
+        return lo, max(lo, hi)
+
+    def _fleet(self):
+        if self._fleet_order is None:
+            order = np.argsort(self._dates, kind='stable')
+            self._fleet_dates = self._dates[order]
+            self._fleet_order = order
+        return self._fleet_order, self._fleet_dates
+
+    def app_labels(self, column):
+        """
+        Value of column on the first row of every app, indexed by appId.
+        """
+        codes = np.array([code for code in self._offsets if code >= 0], dtype=int)
+        starts = [self._offsets[code][0] for code in codes]
+        return pd.Series(self.rows[column].take(starts).to_numpy(), index=self._categories[codes], name=column)
+
+    def app_rows(self, app_id):
+        start, end = self._app_bounds(app_id)
+        return self.rows.iloc[start:end]
+
+    def window(self, app_id, start, end, include_end=True):
+        """
+        Rows of app_id (every app when None) dated from start up to end, end included
+        unless include_end is False.
+        """
+        if app_id is None:
+            order, dates = self._fleet()
+            lo, hi = self._window_bounds(dates, start, end, include_end)
+            count_rows(hi - lo)
+            return self.rows.take(order[lo:hi])
+
+        app_start, app_end = self._app_bounds(app_id)
+        lo, hi = self._window_bounds(self._dates[app_start:app_end], start, end, include_end)
+        count_rows(hi - lo)
+        return self.rows.iloc[app_start + lo:app_start + hi]
+
+    def count(self, app_id, start, end, include_end=True):
+        """
+        Number of incidents of app_id (every app when None) from start up to end.
+        """
+        if app_id is not None:
+            return len(self.window(app_id, start, end, include_end))
+        lo, hi = self._window_bounds(self._fleet()[1], start, end, include_end)
+        return int(hi - lo)
+
+
+def incident_index(df):
+    """
+    Return the (appId, date) index of df, built once per dataset and shared by every caller.
+    """
+    return derived(df, 'index', IncidentIndex)
@@ -0,0 +1,97 @@
+"""
+Load test the JSON API: N concurrent clients replaying a mix of its requests.
+
+Each client keeps one HTTP connection open and sends its requests back to back for
+--seconds. The p50/p99 latency and throughput are reported per route and overall.
+With --etag the clients revalidate what they already fetched with If-None-Match,
+as a polling dashboard would.
+
+    python apiServer.py --data-dir exports/ &
+    python loadTest.py --clients 50 --seconds 20
+"""
+import argparse
+import http.client
+import json
+import threading
+import time
+from urllib.parse import quote, urlsplit
+
+import numpy as np
+
+from periodWindow import METRIC_RANGES
+
+
+def request_mix(apps):
+    """
+    Paths of the requests the clients cycle through: metrics and charts of the sampled apps, the fleet table.
+    """
+    paths = [f"/fleet?range={quote(metric_range)}" for metric_range in METRIC_RANGES]
+    for app_id in apps:
+        app = quote(app_id, safe='')
+        paths += [f"/metrics/{app}?range={quote(metric_range)}" for metric_range in METRIC_RANGES]
+        paths += [f"/charts/{kind}/{app}?range=3+Months" for kind in ('trend', 'source', 'severity')]
+    return paths
+
+
+def run_client(host, port, paths, offset, deadline, etag, results):
+    connection = http.client.HTTPConnection(host, port)
+    etags = {}
+    position = offset
+    while time.perf_counter() < deadline:
+        path = paths[position % len(paths)]
+        position += 1
+        headers = {'If-None-Match': etags[path]} if etag and path in etags else {}
+        started = time.perf_counter()
+        connection.request('GET', path, headers=headers)
+        response = connection.getresponse()
+        response.read()
+        results.append((path.split('/')[1].split('?')[0], response.status, time.perf_counter() - started))
+        if response.getheader('ETag'):
+            etags[path] = response.getheader('ETag')
+    connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--url', default='http://127.0.0.1:8600', help="base URL of the API server")
+    parser.add_argument('--clients', type=int, default=20, help="concurrent clients")
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--apps', type=int, default=10, help="apps sampled into the request mix")
+    parser.add_argument('--etag', action='store_true', help="revalidate with If-None-Match")
+    args = parser.parse_args()
+
+    url = urlsplit(args.url)
+    connection = http.client.HTTPConnection(url.hostname, url.port)
+    connection.request('GET', '/apps')
+    apps = [app['appId'] for app in json.loads(connection.getresponse().read())][:args.apps]
+    connection.close()
+    paths = request_mix(apps)
+
+    results = []  # (route, status, seconds); list.append is atomic
+    deadline = time.perf_counter() + args.seconds
+    clients = [threading.Thread(target=run_client,
+                                args=(url.hostname, url.port, paths, i * len(paths) // args.clients,
+                                      deadline, args.etag, results))
+               for i in range(args.clients)]
+    started = time.perf_counter()
+    for client in clients:
+        client.start()
+    for client in clients:
+        client.join()
+    elapsed = time.perf_counter() - started
+
+    routes = np.array([route for route, _, _ in results])
+    statuses = np.array([status for _, status, _ in results])
+    latencies = np.array([seconds for _, _, seconds in results]) * 1000
+    print(f"{args.clients} clients, {len(paths)} distinct requests over {len(apps)} apps, "
+          f"{len(results):,} requests in {elapsed:.1f} s")
+    print(f"{'route':<10}{'requests':>10}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'304s':>8}{'errors':>8}")
+    for route in [*np.unique(routes), 'all']:
+        mask = np.ones(len(routes), dtype=bool) if route == 'all' else routes == route
+        p50, p99 = np.percentile(latencies[mask], [50, 99])
+        print(f"{route:<10}{mask.sum():>10,}{mask.sum() / elapsed:>10.0f}{p50:>10.1f}{p99:>10.1f}"
+              f"{(statuses[mask] == 304).sum():>8}{(statuses[mask] >= 400).sum():>8}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,22 +1,19 @@
 import streamlit as st
-import pandas as pd
-import os
-import glob
+from dataLoader import load_incidents
 from metrics import metrics
 from graphs import graphs
 from forecasting import forecasting
+from fleet import fleet
+from debugPanel import debug_panel, release_tracing
+from memoryUsage import track_session
+from profiler import export_prometheus
 
 # Set page configuration to use a wide layout
 st.set_page_config(layout="wide")
 
-# Load JSON data into a DataFrame
-df = pd.concat(map(pd.read_json, glob.glob(os.path.join('', "*.json"))))
-
-# Convert the date column to datetime
-df['date'] = pd.to_datetime(df['date'])
-
-# Combine appId and appName for display in the dropdown
-df['app_display'] = df['appId'].str.strip() + ' (' + df['appName'].str.strip() + ')'
+# Load the incident data (parsed once, cached until the JSON exports change and shared by every session)
+df = load_incidents('')
+track_session()
 
 # Custom CSS to hide Streamlit's default navbar and footer
 hide_streamlit_style = """
@@ -66,17 +63,35 @@ def main():
         </style>
         """, unsafe_allow_html=True)
 
-    # Creating tabs for Metrics and Graphs
-    tab1, tab2, tab3 = st.tabs(["Metrics", "Forecasting", "📈 Chart"])
+    # Creating tabs for Metrics and Graphs; switching tabs reruns the script and only the
+    # open tab's view is computed. The hidden views keep their widget values (persist_state)
+    # and serve their figures, reports and forecasts from the shared caches when reopened.
+    tab1, tab2, tab3, tab4 = st.tabs(["Metrics", "Forecasting", "📈 Chart", "Fleet"], key="main_tab",
+                                     on_change="rerun")
+
+    if tab1.open:
+        with tab1:
+            metrics(df)
+
+    if tab2.open:
+        with tab2:
+            forecasting()
+
+    if tab3.open:
+        with tab3:
+            graphs(df)
 
-    with tab1:
-        metrics(df)
+    if tab4.open:
+        with tab4:
+            fleet(df)
 
-    with tab2:
-        forecasting()
+    if st.query_params.get("debug") == "1":
+        debug_panel(df)
+    else:
+        release_tracing()
 
-    with tab3:
-        graphs(df)
+    # Call statistics for the metrics collector, when SRE_DASHBOARD_PROMETHEUS_FILE is set
+    export_prometheus()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,89 @@
+import os
+import threading
+import time
+
+import numpy as np
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from frameCache import derived
+
+# Sessions without a rerun for this long no longer count as active
+SESSION_IDLE_SECONDS = 600
+
+_lock = threading.Lock()
+_sessions = {}  # session id -> time of its last script run
+_resident_by_sessions = {}  # active session count -> resident memory at the latest script run with it
+
+
+def resident_bytes():
+    """
+    Resident memory of the server process, or None where /proc is not available.
+    """
+    try:
+        with open('/proc/self/statm') as file:
+            return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def frame_bytes(df):
+    """
+    Bytes held by the columns of df (categories included), computed once per frame.
+    """
+    return derived(df, 'memory_bytes', lambda df: int(df.memory_usage(deep=True).sum()))
+
+
+def track_session():
+    """
+    Record a script run of the current Streamlit session.
+    """
+    ctx = get_script_run_ctx()
+    if ctx is not None:
+        with _lock:
+            _sessions[ctx.session_id] = time.monotonic()
+        resident = resident_bytes()
+        if resident is not None:
+            sessions = active_sessions()
+            with _lock:
+                _resident_by_sessions[sessions] = resident
+
+
+def resident_bytes_added_per_session():
+    """
+    Resident memory one more active session adds: the slope of the resident memory seen
+    against the active session count, or None until two different counts were seen.
+    """
+    with _lock:
+        samples = sorted(_resident_by_sessions.items())
+    if len(samples) < 2:
+        return None
+    counts, residents = np.array(samples, dtype=float).T
+    return int(np.polyfit(counts, residents, 1)[0])
+
+
+def active_session_ids():
+    """
+    Ids of the sessions with a script run in the last SESSION_IDLE_SECONDS.
+    """
+    cutoff = time.monotonic() - SESSION_IDLE_SECONDS
+    with _lock:
+        for session_id in [session_id for session_id, seen in _sessions.items() if seen < cutoff]:
+            del _sessions[session_id]
+        return set(_sessions)
+
+
+def active_sessions():
+    return len(active_session_ids())
+
+
+def memory_report(df):
+    """
+    Resident memory of the process, the shared frame (held once whatever the number of
+    sessions), the active sessions and the resident memory each session adds.
+    """
+    return {
+        'resident_bytes': resident_bytes(),
+        'frame_bytes': frame_bytes(df),
+        'sessions': active_sessions(),
+        'resident_bytes_added_per_session': resident_bytes_added_per_session(),
+    }
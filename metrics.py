@@ -1,19 +1,23 @@
 import streamlit as st
 from fpdf import FPDF
-from metricsFunc import get_severity_incidents_sidebar, get_total_incidents_sidebar, calculate_average_downtime_sidebar, \
-    assess_risk
+from frameCache import dataset_version
+from lruCache import LRUCache
+from metricsFunc import compute_metrics_bundle, get_baseline_avg_incidents
+from periodWindow import METRIC_RANGES
+from profiler import profiled
 from io import BytesIO
-import base64
 
+# Rendered PDF reports keyed by (dataset version, appId, metrics range), least recently used evicted first
+PDF_CACHE = LRUCache(maxsize=64)
 
-def encode_pdf(pdf_output):
-    # Get the byte data from the BytesIO object
-    pdf_data = pdf_output.getvalue()
-    # Encode the byte data in base64
-    return base64.b64encode(pdf_data).decode('utf-8')
 
 # Function to generate PDF with metrics in tabular format
-def generate_pdf(df, selected_app_id, selected_app_display, selected_metric, baseline_avg_incidents):
+@profiled
+def generate_pdf(df, selected_app_id, selected_app_display, selected_metric, baseline_avg_incidents, bundle=None):
+    # Reuse the metrics already computed for the page when they are passed in
+    if bundle is None:
+        bundle = compute_metrics_bundle(selected_app_id, df, selected_metric, baseline_avg_incidents)
+
     pdf = FPDF()
     pdf.add_page()
 
@@ -29,23 +33,21 @@ def generate_pdf(df, selected_app_id, selected_app_display, selected_metric, bas
     pdf.ln(8)  # Add a line break
 
     # Total Incidents
-    current_incidents, previous_incidents, percentage_change = get_total_incidents_sidebar(selected_app_id, df, selected_metric)
-    delta_incidents = current_incidents - previous_incidents
-    pdf.cell(200, 10, txt=f"Total Incidents: {current_incidents} \n({delta_incidents:+.0f} ({percentage_change:+.2f}%))", ln=True)
+    pdf.cell(200, 10, txt=f"Total Incidents: {bundle['current_incidents']} \n({bundle['delta_incidents']:+.0f} ({bundle['percentage_change']:+.2f}%))", ln=True)
 
     # Average Downtime
-    average_downtime = calculate_average_downtime_sidebar(df, selected_app_id, selected_metric)
-    pdf.cell(200, 10, txt=f"Average Downtime (minutes): {average_downtime:.2f}", ln=True)
+    pdf.cell(200, 10, txt=f"Average Downtime (minutes): {bundle['average_downtime']:.2f}", ln=True)
 
     # Risk
-    risk_info = assess_risk(df, selected_app_id, baseline_avg_incidents)
-    pdf.cell(200, 10, txt=f"Risk Level: {risk_info['level']}", ln=True)
+    pdf.cell(200, 10, txt=f"Risk Level: {bundle['risk']['level']}", ln=True)
 
     pdf.ln(10)  # Add a line break before the table
 
     # Severity Metrics Table
     pdf.set_font("Arial", size=10)
-    severity_counts, severity_deltas, severity_percentage_changes = get_severity_incidents_sidebar(selected_app_id, df, selected_metric)
+    severity_counts = bundle['severity_counts']
+    severity_deltas = bundle['severity_deltas']
+    severity_percentage_changes = bundle['severity_percentage_changes']
     severity_order = ['P1', 'P2', 'P3', 'P4']
 
     # Table Header
@@ -69,6 +71,24 @@ def generate_pdf(df, selected_app_id, selected_app_display, selected_metric, bas
     return pdf
 
 
+def pdf_to_bytes(pdf):
+    # Save PDF to a BytesIO object
+    pdf_output = BytesIO()
+    pdf.output(pdf_output)
+    return pdf_output.getvalue()
+
+
+def render_pdf(df, selected_app_id, selected_app_display, selected_metric, baseline_avg_incidents, bundle=None):
+    """
+    Return the metrics report of the selection as PDF bytes, rendered once per dataset version.
+    """
+    def render():
+        return pdf_to_bytes(generate_pdf(df, selected_app_id, selected_app_display, selected_metric,
+                                         baseline_avg_incidents, bundle))
+
+    return PDF_CACHE.get_or_create((dataset_version(df), selected_app_id, selected_metric), render)
+
+
 # Function to display the Metrics page content
 def metrics(df):
     # Verify content of app_displays
@@ -78,7 +98,7 @@ def metrics(df):
     default_app_display = "B6OV (My Business Portal)"
 
     # Calculate the baseline average number of incidents using the entire DataFrame
-    baseline_avg_incidents = df.groupby('appId').size().mean()
+    baseline_avg_incidents = get_baseline_avg_incidents(df)
 
     # Create columns for dropdowns and buttons
     col1, col2, col3, col4 = st.columns([3, 3, 1, 1])
@@ -86,52 +106,49 @@ def metrics(df):
     with col1:
         # Set default appId to "B6OV"
         selected_app_display = st.selectbox("Select App ID", app_displays,
-                                            index=list(app_displays).index(default_app_display), key="app_id")
+                                            index=list(app_displays).index(default_app_display), key="app_id",
+                                            persist_state="session")
         selected_app_id = selected_app_display.split(' ')[0]
 
     with col2:
         # Dropdown for selecting metrics range
-        metric_options = ['1 Day', '1 Week', '1 Month', '3 Months', '6 Months', '1 Year']
-        selected_metric = st.selectbox("Select Metrics Range", metric_options, index=0, key="metric_sidebar")
-
-    with col3:
-        # Generate PDF
-        pdf = generate_pdf(df, selected_app_id, selected_app_display, selected_metric, baseline_avg_incidents)
-
-        # Save PDF to a BytesIO object
-        pdf_output = BytesIO()
-        pdf.output(pdf_output)
-        pdf_output.seek(0)
+        selected_metric = st.selectbox("Select Metrics Range", METRIC_RANGES, index=0, key="metric_sidebar",
+                                       persist_state="session")
 
-        # Encode PDF
-        pdf_base64 = encode_pdf(pdf_output)
+    # Every metric shown on the page and in the PDF, from one pass over the selected app's data
+    bundle = compute_metrics_bundle(selected_app_id, df, selected_metric, baseline_avg_incidents)
 
-        # Button to download PDF, styled like the Open Jira button
+    with col3:
+        # Export: the PDF is only rendered when the button is clicked, styled like the Open Jira button
         st.markdown(
-            f'''
-            <div style="margin-top: 5px; margin-left: 20px">
-                <a href="data:application/pdf;base64,{pdf_base64}"
-                    download="Metrics_Report_{selected_app_id}.pdf"
-                    style="
-                        display: inline-block;
-                        padding: 8px 16px;
-                        font-size: 14px;
-                        font-weight: 600;
-                        color: #ffffff;
-                        background-color: #000000;
-                        border: none;
-                        border-radius: 4px;
-                        text-align: center;
-                        text-decoration: none;
-                        cursor: pointer;
-                        box-shadow: 0 2px 4px rgba(0, 0, 0, 0.2);
-                        transition: background-color 0.3s, transform 0.2s;
-                    ">Export</a>
-            </div>
+            '''
+            <style>
+            .st-key-export_pdf {
+                margin-top: 5px;
+                margin-left: 20px;
+            }
+            .st-key-export_pdf button {
+                padding: 8px 16px;
+                font-weight: 600;
+                color: #ffffff;
+                background-color: #000000;
+                border: none;
+                border-radius: 4px;
+                box-shadow: 0 2px 4px rgba(0, 0, 0, 0.2);
+            }
+            </style>
             ''',
             unsafe_allow_html=True
         )
-
+        st.download_button(
+            "Export",
+            data=lambda: render_pdf(df, selected_app_id, selected_app_display, selected_metric,
+                                    baseline_avg_incidents, bundle),
+            file_name=f"Metrics_Report_{selected_app_id}.pdf",
+            mime="application/pdf",
+            on_click='ignore',
+            key="export_pdf",
+        )
 
     with col4:
         # Button to open Jira
@@ -164,25 +181,23 @@ def metrics(df):
 
     with col1:
         # Total Incidents
-        current_incidents, previous_incidents, percentage_change = get_total_incidents_sidebar(selected_app_id, df, selected_metric)
-        delta_incidents = current_incidents - previous_incidents
-        st.metric("Total Incidents", current_incidents, delta=f"{delta_incidents:+.0f} ({abs(percentage_change):.2f}%)", help="Total number of incidents in the selected period.")
+        st.metric("Total Incidents", bundle['current_incidents'], delta=f"{bundle['delta_incidents']:+.0f} ({abs(bundle['percentage_change']):.2f}%)", help="Total number of incidents in the selected period.")
 
     with col2:
         # Average Downtime
-        average_downtime = calculate_average_downtime_sidebar(df, selected_app_id, selected_metric)
-        st.metric("Average Downtime (minutes)", f"{average_downtime:.2f}", help="Average downtime of the application in minutes.")
+        st.metric("Average Downtime (minutes)", f"{bundle['average_downtime']:.2f}", help="Average downtime of the application in minutes.")
 
     with col3:
         # Risk
-        risk_info = assess_risk(df, selected_app_id, baseline_avg_incidents)
-        st.metric("Risk", risk_info['level'], help="Risk level based on incidents and other metrics.")
+        st.metric("Risk", bundle['risk']['level'], help="Risk level based on incidents and other metrics.")
 
     # Severity metrics in the sidebar
     st.header("Severity Metrics")
 
     # Fetch severity metrics
-    severity_counts, severity_deltas, severity_percentage_changes = get_severity_incidents_sidebar(selected_app_id, df, selected_metric)
+    severity_counts = bundle['severity_counts']
+    severity_deltas = bundle['severity_deltas']
+    severity_percentage_changes = bundle['severity_percentage_changes']
 
     # Define the order of severity
     severity_order = ['P1', 'P2', 'P3', 'P4']
@@ -1,100 +1,53 @@
+import numpy as np
 import pandas as pd
 
+from incidentCube import incident_cube, window_count, window_mean_duration, window_value_counts
+from incidentIndex import incident_index
+from periodWindow import period_window
+from profiler import profiled
+
+def get_period_rollups(app_id, df, metric_range=None):
+    """
+    Daily rollup rows of app_id for the current and the previous period of metric_range.
+    """
+    cube = incident_cube(df)
+    window = period_window(df, metric_range)
+    current = cube.window(app_id, window.start, window.end)
+    previous = cube.window(app_id, window.previous_start, window.start, include_end=False)
+    return current, previous
+
+def get_percentage_change(current_incidents, previous_incidents):
+    if previous_incidents == 0:
+        return 0  # Infinite increase if there were no previous incidents
+    return ((current_incidents - previous_incidents) / previous_incidents) * 100
+
+@profiled
 def get_total_incidents_sidebar(app_id, df, metric_range=None):
-    current_date = df['date'].max()
-
-    # Determine the start of the current period based on the selected metric range
-    if metric_range:
-        if metric_range == '1 Day':
-            start_of_range = current_date - pd.DateOffset(days=1)
-        elif metric_range == '1 Week':
-            start_of_range = current_date - pd.DateOffset(weeks=1)
-        elif metric_range == '1 Month':
-            start_of_range = (current_date - pd.DateOffset(months=1)).replace(day=1)
-        elif metric_range == '3 Months':
-            start_of_range = (current_date - pd.DateOffset(months=2)).replace(day=1)
-        elif metric_range == '6 Months':
-            start_of_range = (current_date - pd.DateOffset(months=5)).replace(day=1)
-        elif metric_range == '1 Year':
-            start_of_range = (current_date - pd.DateOffset(years=1)).replace(day=1)
-    else:
-        start_of_range = current_date
-
-    # Filter data from the start of the current period to the end of the current period
-    df_time_filtered = df[(df['date'] >= start_of_range) & (df['date'] <= current_date)]
-    current_incidents = df_time_filtered[df_time_filtered['appId'] == app_id].shape[0]
-
-    # Determine the start of the previous period based on the selected metric range
-    if metric_range:
-        if metric_range == '1 Day':
-            start_of_previous_range = start_of_range - pd.DateOffset(days=1)
-        elif metric_range == '1 Week':
-            start_of_previous_range = start_of_range - pd.DateOffset(weeks=1)
-        elif metric_range == '1 Month':
-            start_of_previous_range = (start_of_range - pd.DateOffset(months=1)).replace(day=1)
-        elif metric_range == '3 Months':
-            start_of_previous_range = (start_of_range - pd.DateOffset(months=3)).replace(day=1)
-        elif metric_range == '6 Months':
-            start_of_previous_range = (start_of_range - pd.DateOffset(months=6)).replace(day=1)
-        elif metric_range == '1 Year':
-            start_of_previous_range = (start_of_range - pd.DateOffset(years=1)).replace(day=1)
-
-    # Filter data from the start of the previous period to the end of the previous period
-    df_previous_filtered = df[(df['date'] >= start_of_previous_range) & (df['date'] < start_of_range)]
-    previous_incidents = df_previous_filtered[df_previous_filtered['appId'] == app_id].shape[0]
+    # Count the incidents of the current and the previous period
+    current_rollup, previous_rollup = get_period_rollups(app_id, df, metric_range)
+    current_incidents = window_count(current_rollup)
+    previous_incidents = window_count(previous_rollup)
 
     # Calculate percentage change
-    if previous_incidents == 0:
-        percentage_change = 0  # Infinite increase if there were no previous incidents
-    else:
-        percentage_change = ((current_incidents - previous_incidents) / previous_incidents) * 100
+    percentage_change = get_percentage_change(current_incidents, previous_incidents)
 
     return current_incidents, previous_incidents, percentage_change
 
+@profiled
 def get_severity_incidents_sidebar(app_id, df, metric_range=None):
-    current_date = df['date'].max()
-
-    # Define metric range mapping
-    metric_range_map = {
-        '1 Day': pd.DateOffset(days=1),
-        '1 Week': pd.DateOffset(weeks=1),
-        '1 Month': pd.DateOffset(months=1),
-        '3 Months': pd.DateOffset(months=2),
-        '6 Months': pd.DateOffset(months=5),
-        '1 Year': pd.DateOffset(years=1)
-    }
+    # Daily rollup of the specific appId for the current and the previous period
+    cube_specific_app, cube_prev_specific_app = get_period_rollups(app_id, df, metric_range)
 
-    # Determine the start and end dates based on the metric range
-    if metric_range and metric_range in metric_range_map:
-        if metric_range in ['3 Months', '6 Months', '1 Year']:
-            start_of_range = (current_date - metric_range_map[metric_range]).replace(day=1)
-        else:
-            start_of_range = current_date - metric_range_map[metric_range]
-        end_of_range = current_date
-
-        # Define previous period for metrics
-        prev_end_of_range = start_of_range - pd.DateOffset(days=1)
-        if metric_range in ['3 Months', '6 Months', '1 Year']:
-            prev_start_of_range = (start_of_range - metric_range_map[metric_range]).replace(day=1)
-        else:
-            prev_start_of_range = start_of_range - metric_range_map[metric_range]
-    else:
-        start_of_range = current_date.replace(day=1)  # Default to current month
-        prev_start_of_range = (current_date - pd.DateOffset(months=1)).replace(day=1)
-        prev_end_of_range = start_of_range - pd.DateOffset(days=1)
-
-    # Filter data from the start of the range to the end of the current period
-    df_time_filtered = df[(df['date'] >= start_of_range) & (df['date'] <= end_of_range)]
-    df_prev_time_filtered = df[(df['date'] >= prev_start_of_range) & (df['date'] <= prev_end_of_range)]
+    # Group by severity and count the number of incidents
+    severity_counts = {severity: count for severity, count in window_value_counts(cube_specific_app, 'severity').items() if count > 0}
+    prev_severity_counts = {severity: count for severity, count in window_value_counts(cube_prev_specific_app, 'severity').items() if count > 0}
 
-    # Filter the data for the specific appId
-    df_specific_app = df_time_filtered[df_time_filtered['appId'] == app_id]
-    df_prev_specific_app = df_prev_time_filtered[df_prev_time_filtered['appId'] == app_id]
+    # Calculate deltas and percentage changes
+    severity_deltas, severity_percentage_changes = get_severity_changes(severity_counts, prev_severity_counts)
 
-    # Group by severity and count the number of incidents
-    severity_counts = df_specific_app['severity'].value_counts().to_dict()
-    prev_severity_counts = df_prev_specific_app['severity'].value_counts().to_dict()
+    return severity_counts, severity_deltas, severity_percentage_changes
 
+def get_severity_changes(severity_counts, prev_severity_counts):
     # Calculate deltas and percentage changes
     severity_deltas = {}
     severity_percentage_changes = {}
@@ -109,48 +62,28 @@ def get_severity_incidents_sidebar(app_id, df, metric_range=None):
         severity_deltas[severity] = delta
         severity_percentage_changes[severity] = percentage_change
 
-    return severity_counts, severity_deltas, severity_percentage_changes
+    return severity_deltas, severity_percentage_changes
 
 
+@profiled
 def calculate_average_downtime_sidebar(df: pd.DataFrame, app_id: str, metric_range=None) -> float:
     """
     Calculate the average downtime for a specific appId within a given time range.
     """
 
-    # Determine the start of the current period based on the selected metric range
-    current_date = df['date'].max()
-
-    if metric_range:
-        if metric_range == '1 Day':
-            start_of_range = current_date - pd.DateOffset(days=1)
-        elif metric_range == '1 Week':
-            start_of_range = current_date - pd.DateOffset(weeks=1)
-        elif metric_range == '1 Month':
-            start_of_range = (current_date - pd.DateOffset(months=1)).replace(day=1)
-        elif metric_range == '3 Months':
-            start_of_range = (current_date - pd.DateOffset(months=2)).replace(day=1)
-        elif metric_range == '6 Months':
-            start_of_range = (current_date - pd.DateOffset(months=5)).replace(day=1)
-        elif metric_range == '1 Year':
-            start_of_range = (current_date - pd.DateOffset(years=1)).replace(day=1)
-    else:
-        start_of_range = current_date
-
-    # Filter data based on the calculated start and end dates
-    filtered_df = df[(df['appId'] == app_id) & (df['date'] >= start_of_range) & (df['date'] <= current_date)]
-
-    # Calculate average downtime
-    average_downtime = filtered_df['duration'].mean() if not filtered_df.empty else 0.0
+    # Calculate average downtime over the current period of the selected metric range
+    window = period_window(df, metric_range)
+    average_downtime = window_mean_duration(incident_cube(df).window(app_id, window.start, window.end))
 
     return average_downtime
 
+@profiled
 def assess_risk(df: pd.DataFrame, app_id: str, baseline_avg_incidents: float) -> dict:
-    # Filter data for the specific appId
-    df_specific_app = df[df['appId'] == app_id]
-
     # Calculate current number of incidents for the specific appId
-    current_incident_count = df_specific_app.shape[0]
+    current_incident_count = incident_cube(df).app_total(app_id)
+    return get_risk_level(current_incident_count, baseline_avg_incidents)
 
+def get_risk_level(current_incident_count, baseline_avg_incidents):
     # Calculate percentage difference
     percentage_diff = ((current_incident_count - baseline_avg_incidents) / baseline_avg_incidents) * 100
 
@@ -164,57 +97,103 @@ def assess_risk(df: pd.DataFrame, app_id: str, baseline_avg_incidents: float) ->
 
 # Function to calculate total incidents and percentage change
 def get_total_incidents(app_id, time_range, df, metric_range=None):
-    current_date = df['date'].max()
-
-    if metric_range:
-        if metric_range == '1 Day':
-            start_of_range = current_date - pd.DateOffset(days=1)
-        elif metric_range == '1 Week':
-            start_of_range = current_date - pd.DateOffset(weeks=1)
-        elif metric_range == '1 Month':
-            start_of_range = current_date - pd.DateOffset(months=1)
-    else:
-        # Determine the start of the current period
-        if time_range == '6 Months':
-            start_of_range = (current_date - pd.DateOffset(months=5)).replace(day=1)
-        elif time_range == '3 Months':
-            start_of_range = (current_date - pd.DateOffset(months=2)).replace(day=1)
-        elif time_range == '1 Year':
-            start_of_range = (current_date - pd.DateOffset(years=1)).replace(day=1)
-        else:
-            start_of_range = current_date.replace(day=1)  # Default to current month
-
-    # Filter data from the start of the current period to the end of the current month
-    df_time_filtered = df[(df['date'] >= start_of_range) & (df['date'] <= current_date)]
-    current_incidents = df_time_filtered[df_time_filtered['appId'] == app_id].shape[0]
-
-    # Determine the start of the previous period
-    if metric_range:
-        if metric_range == '1 Day':
-            start_of_previous_range = start_of_range - pd.DateOffset(days=1)
-        elif metric_range == '1 Week':
-            start_of_previous_range = start_of_range - pd.DateOffset(weeks=1)
-        elif metric_range == '1 Month':
-            start_of_previous_range = start_of_range - pd.DateOffset(months=1)
-    else:
-        if time_range == '6 Months':
-            start_of_previous_range = (start_of_range - pd.DateOffset(months=6)).replace(day=1)
-        elif time_range == '3 Months':
-            start_of_previous_range = (start_of_range - pd.DateOffset(months=3)).replace(day=1)
-        elif time_range == '1 Year':
-            start_of_previous_range = (start_of_range - pd.DateOffset(years=1)).replace(day=1)
-        else:
-            start_of_previous_range = (start_of_range - pd.DateOffset(months=1)).replace(
-                day=1)  # Default to previous month
+    return get_total_incidents_sidebar(app_id, df, metric_range or time_range)
 
-    # Filter data from the start of the previous period to the end of the previous period
-    df_previous_filtered = df[(df['date'] >= start_of_previous_range) & (df['date'] < start_of_range)]
-    previous_incidents = df_previous_filtered[df_previous_filtered['appId'] == app_id].shape[0]
+@profiled
+def compute_metrics_bundle(app_id, df, metric_range=None, baseline_avg_incidents=None):
+    """
+    Compute every metric card of app_id for metric_range in one grouped pass over its rollup.
 
-    # Calculate percentage change
-    if previous_incidents == 0:
-        percentage_change = 0  # Infinite increase if there were no previous incidents
+    Returns the values of get_total_incidents_sidebar, get_severity_incidents_sidebar,
+    calculate_average_downtime_sidebar and assess_risk (when a baseline is given) as a dict.
+    """
+    current_rollup, previous_rollup = get_period_rollups(app_id, df, metric_range)
+    rollup = pd.concat([current_rollup, previous_rollup], ignore_index=True)
+    rollup['period'] = pd.Categorical.from_codes(np.repeat([0, 1], [len(current_rollup), len(previous_rollup)]),
+                                                 categories=['current', 'previous'])
+
+    # One pass: incidents and durations per (severity, period); undated severities still count towards the totals
+    grouped = rollup.groupby(['severity', 'period'], observed=False, dropna=False)[
+        ['count', 'duration_sum', 'duration_count']].sum()
+    counts = grouped['count'].unstack('period')
+    current_totals = grouped.xs('current', level='period')
+
+    current_incidents = int(counts['current'].sum())
+    previous_incidents = int(counts['previous'].sum())
+
+    # Severity counts ordered like value_counts(), as in get_severity_incidents_sidebar
+    by_severity = counts[counts.index.notna()]
+    severity_counts = {severity: count for severity, count in by_severity['current'].sort_values(ascending=False).items() if count > 0}
+    prev_severity_counts = {severity: count for severity, count in by_severity['previous'].sort_values(ascending=False).items() if count > 0}
+    severity_deltas, severity_percentage_changes = get_severity_changes(severity_counts, prev_severity_counts)
+
+    duration_count = current_totals['duration_count'].sum()
+    if current_incidents == 0:
+        average_downtime = 0.0
     else:
-        percentage_change = ((current_incidents - previous_incidents) / previous_incidents) * 100
+        average_downtime = current_totals['duration_sum'].sum() / duration_count if duration_count else float('nan')
+
+    bundle = {
+        'current_incidents': current_incidents,
+        'previous_incidents': previous_incidents,
+        'delta_incidents': current_incidents - previous_incidents,
+        'percentage_change': get_percentage_change(current_incidents, previous_incidents),
+        'severity_counts': severity_counts,
+        'severity_deltas': severity_deltas,
+        'severity_percentage_changes': severity_percentage_changes,
+        'average_downtime': average_downtime,
+    }
+    if baseline_avg_incidents is not None:
+        bundle['risk'] = get_risk_level(incident_cube(df).app_total(app_id), baseline_avg_incidents)
+    return bundle
 
-    return current_incidents, previous_incidents, percentage_change
+def get_baseline_avg_incidents(df):
+    """
+    Average number of incidents per app over the whole history, the baseline of assess_risk.
+    """
+    app_totals = incident_cube(df).app_totals
+    return app_totals[app_totals > 0].mean()
+
+def compute_fleet_metrics(df, metric_range=None):
+    """
+    Compute the metric cards of every app at once, one row per app sorted by incidents.
+
+    The columns hold the values compute_metrics_bundle gives for each app; they come
+    from one pass over the fleet's rollup for the current and the previous period.
+    """
+    cube = incident_cube(df)
+    window = period_window(df, metric_range)
+    current_rollup = cube.window(None, window.start, window.end)
+    previous_rollup = cube.window(None, window.previous_start, window.start, include_end=False)
+
+    def per_app(rollup, column):
+        codes = rollup['appId'].cat.codes.to_numpy()
+        known = codes >= 0
+        return np.bincount(codes[known], weights=rollup[column].to_numpy()[known], minlength=len(cube.app_ids))
+
+    current_incidents = per_app(current_rollup, 'count').astype(np.int64)
+    previous_incidents = per_app(previous_rollup, 'count').astype(np.int64)
+    duration_sum = per_app(current_rollup, 'duration_sum')
+    duration_count = per_app(current_rollup, 'duration_count')
+    baseline_avg_incidents = get_baseline_avg_incidents(df)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        percentage_change = np.where(previous_incidents == 0, 0,
+                                     (current_incidents - previous_incidents) / previous_incidents * 100)
+        average_downtime = np.where(current_incidents == 0, 0.0, duration_sum / duration_count)
+        risk_diff = (cube.app_totals - baseline_avg_incidents) / baseline_avg_incidents * 100
+
+    fleet = pd.DataFrame({
+        'appId': cube.app_ids,
+        'current_incidents': current_incidents,
+        'previous_incidents': previous_incidents,
+        'delta_incidents': current_incidents - previous_incidents,
+        'percentage_change': percentage_change,
+        'average_downtime': average_downtime,
+        'risk': np.select([risk_diff > 70, risk_diff > 40], ['High', 'Medium'], 'Low'),
+    })
+
+    # Only apps with incidents in the data, like the app dropdowns
+    fleet = fleet[cube.app_totals > 0]
+    fleet.insert(1, 'app_display', fleet['appId'].map(incident_index(df).app_labels('app_display')))
+    return fleet.sort_values(['current_incidents', 'appId'], ascending=[False, True], ignore_index=True)
@@ -0,0 +1,110 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+
+# Folder that holds one sub-folder per trained version of the forecasting models
+MODEL_STORE_DIR = 'models'
+CURRENT_FILE = 'CURRENT'
+MANIFEST_FILE = 'manifest.json'
+
+# Trained versions kept on disk, including the current one
+KEEP_VERSIONS = 3
+
+
+def series_label(key):
+    """
+    Display name of an (appId, source, category) series key.
+    """
+    return ' / '.join('(none)' if part is None else part for part in key)
+
+
+class ModelStore:
+    """
+    Versioned store of the fitted forecasting models, one per incident series.
+
+    A training run writes its models into a new version folder, then publishes a
+    manifest (series, fit statistics, training data) and points CURRENT at that
+    version, so readers only ever see complete versions. Versions are immutable.
+    """
+
+    def __init__(self, root=MODEL_STORE_DIR, keep_versions=KEEP_VERSIONS):
+        self.root = root
+        self.keep_versions = keep_versions
+        self._manifests = {}  # version -> manifest
+
+    def new_version(self):
+        """
+        Create the folder of a new, unpublished version and return its name.
+        """
+        os.makedirs(self.root, exist_ok=True)
+        stamp = time.strftime('%Y%m%dT%H%M%S')
+        version, attempt = stamp, 1
+        while os.path.exists(os.path.join(self.root, version)):
+            attempt += 1
+            version = f"{stamp}-{attempt}"
+        os.makedirs(os.path.join(self.root, version))
+        return version
+
+    @staticmethod
+    def model_file(key):
+        return hashlib.sha1(json.dumps(list(key)).encode()).hexdigest()[:16] + '.pkl'
+
+    def path(self, version, file_name):
+        return os.path.join(self.root, version, file_name)
+
+    def publish(self, version, manifest):
+        """
+        Write the manifest of version, make it the current version and drop the oldest ones.
+
+        Returns the manifest as written.
+        """
+        manifest = dict(manifest, version=version)
+        with open(self.path(version, MANIFEST_FILE), 'w') as file:
+            json.dump(manifest, file, indent=1)
+
+        current = os.path.join(self.root, CURRENT_FILE)
+        with open(current + '.tmp', 'w') as file:
+            file.write(version)
+        os.replace(current + '.tmp', current)
+
+        published = sorted(name for name in os.listdir(self.root)
+                           if os.path.exists(self.path(name, MANIFEST_FILE)))
+        for name in published[:-self.keep_versions]:
+            if name != version:
+                shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+        return manifest
+
+    def current_version(self):
+        try:
+            with open(os.path.join(self.root, CURRENT_FILE)) as file:
+                return file.read().strip() or None
+        except OSError:
+            return None
+
+    def manifest(self, version=None):
+        """
+        Manifest of version (default: the current one), or None when nothing is published.
+        """
+        version = version or self.current_version()
+        if version is None:
+            return None
+        if version not in self._manifests:
+            with open(self.path(version, MANIFEST_FILE)) as file:
+                self._manifests[version] = json.load(file)
+        return self._manifests[version]
+
+    def series(self, version=None):
+        """
+        {series key: manifest entry} of every model in version (default: the current one).
+        """
+        manifest = self.manifest(version)
+        return {} if manifest is None else {tuple(entry['key']): entry for entry in manifest['series']}
+
+    def model_path(self, key, version=None):
+        version = version or self.current_version()
+        return self.path(version, self.series(version)[tuple(key)]['file'])
+
+
+STORE = ModelStore()
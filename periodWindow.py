@@ -0,0 +1,65 @@
+import re
+from collections import namedtuple
+
+import pandas as pd
+
+from frameCache import derived
+from incidentCube import incident_cube
+
+# Ranges offered by the dropdowns, in display order; '<N> Days' is accepted as well
+METRIC_RANGES = ['1 Day', '1 Week', '1 Month', '3 Months', '6 Months', '1 Year', 'Month to date', 'Quarter to date']
+
+# The current period runs from start to end (inclusive), the previous one from previous_start up to start
+PeriodWindow = namedtuple('PeriodWindow', ['start', 'end', 'previous_start'])
+
+_N_DAYS = re.compile(r'^(\d+) Days?$')
+
+
+def resolve_window(current_date, range_key=None):
+    """
+    Return the (current, previous) period bounds of range_key ending at current_date.
+
+    Calendar ranges start on the first of a month: '3 Months' is the current month and
+    the two before it. The previous period is the same span right before the current one.
+    Without a range_key the current month to date is used.
+    """
+    range_key = range_key or 'Month to date'
+
+    if range_key in ('1 Day', '1 Week') or _N_DAYS.match(range_key):
+        days = {'1 Day': 1, '1 Week': 7}.get(range_key) or int(_N_DAYS.match(range_key).group(1))
+        start = current_date - pd.DateOffset(days=days)
+        return PeriodWindow(start, current_date, start - pd.DateOffset(days=days))
+
+    if range_key == 'Month to date':
+        start = current_date.replace(day=1)
+        return PeriodWindow(start, current_date, (start - pd.DateOffset(months=1)).replace(day=1))
+
+    if range_key == 'Quarter to date':
+        start = current_date.replace(month=current_date.month - (current_date.month - 1) % 3, day=1)
+        return PeriodWindow(start, current_date, (start - pd.DateOffset(months=3)).replace(day=1))
+
+    # Calendar ranges: how far back the current period starts and how long the previous one is
+    calendar_offsets = {
+        '1 Month': (pd.DateOffset(months=1), pd.DateOffset(months=1)),
+        '3 Months': (pd.DateOffset(months=2), pd.DateOffset(months=3)),
+        '6 Months': (pd.DateOffset(months=5), pd.DateOffset(months=6)),
+        '1 Year': (pd.DateOffset(years=1), pd.DateOffset(years=1)),
+    }
+    if range_key not in calendar_offsets:
+        raise ValueError(f"Unknown range: {range_key!r}")
+
+    back, span = calendar_offsets[range_key]
+    start = (current_date - back).replace(day=1)
+    return PeriodWindow(start, current_date, (start - span).replace(day=1))
+
+
+def period_window(df, range_key=None):
+    """
+    Return the period bounds of range_key for the incidents in df.
+
+    current_date (the latest incident) and every window are computed once per dataset.
+    """
+    windows = derived(df, 'period_windows', lambda df: {})
+    if range_key not in windows:
+        windows[range_key] = resolve_window(incident_cube(df).current_date, range_key)
+    return windows[range_key]
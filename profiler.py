@@ -0,0 +1,207 @@
+import functools
+import logging
+import os
+import tempfile
+import threading
+import time
+import tracemalloc
+
+# Local file the call statistics are exported to in the Prometheus text format, e.g. for
+# node_exporter's textfile collector; set with this environment variable (unset disables it)
+PROMETHEUS_FILE_VARIABLE = 'SRE_DASHBOARD_PROMETHEUS_FILE'
+PROMETHEUS_FILE = os.environ.get(PROMETHEUS_FILE_VARIABLE) or None
+PROMETHEUS_INTERVAL_SECONDS = 15
+METRIC_PREFIX = 'sre_dashboard'
+
+_lock = threading.Lock()
+_stats = {}  # function name -> CallStats
+_local = threading.local()  # .rows: rows scanned by this thread, .peaks: see _Allocations
+_last_export = None
+_tracing_users = 0  # start_tracing() calls not yet matched by stop_tracing()
+
+logger = logging.getLogger(__name__)
+
+
+class CallStats:
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.last_seconds = 0.0
+        self.rows = 0
+        self.allocated_bytes = 0
+        self.traced_calls = 0
+
+    def as_dict(self):
+        return {
+            'calls': self.calls,
+            'total_ms': self.seconds * 1000,
+            'mean_ms': self.seconds * 1000 / self.calls if self.calls else 0.0,
+            'max_ms': self.max_seconds * 1000,
+            'last_ms': self.last_seconds * 1000,
+            'rows_scanned': self.rows,
+            'mean_allocated_kib': self.allocated_bytes / 1024 / self.traced_calls if self.traced_calls else None,
+        }
+
+
+def start_tracing():
+    """
+    Start tracing allocations with tracemalloc for one more user.
+
+    tracemalloc is process-wide: it runs as long as any user needs it, so every
+    start_tracing() must be matched by one stop_tracing(). Nothing else in the
+    dashboard starts or stops it.
+    """
+    global _tracing_users
+    with _lock:
+        _tracing_users += 1
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+
+def stop_tracing():
+    global _tracing_users
+    with _lock:
+        _tracing_users = max(_tracing_users - 1, 0)
+        if not _tracing_users and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+
+def tracing_users():
+    return _tracing_users
+
+
+def count_rows(rows):
+    """
+    Add rows to the rows scanned by the profiled calls running on this thread.
+    """
+    _local.rows = getattr(_local, 'rows', 0) + rows
+
+
+class _Allocations:
+    """
+    Peak traced memory above the start of a call, while tracemalloc is tracing.
+
+    tracemalloc keeps one peak per process: a nested call resets it, so every call
+    on the thread's stack keeps the highest value seen before its children reset it.
+    Calls running on other threads at the same time add to each other's peaks.
+    """
+
+    def __init__(self):
+        self.start = None
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            peaks = _local.__dict__.setdefault('peaks', [])
+            if peaks:
+                peaks[-1] = max(peaks[-1], peak)
+            tracemalloc.reset_peak()
+            peaks.append(current)
+            self.start = current
+
+    def stop(self):
+        if self.start is None:
+            return None
+        peaks = _local.peaks
+        highest = max(peaks.pop(), tracemalloc.get_traced_memory()[1] if tracemalloc.is_tracing() else 0)
+        if peaks:
+            peaks[-1] = max(peaks[-1], highest)
+        return highest - self.start
+
+
+def profiled(function):
+    """
+    Record the wall time, rows scanned and (while tracemalloc traces) bytes allocated of every call.
+    """
+    name = f"{function.__module__}.{function.__qualname__}"
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        rows = getattr(_local, 'rows', 0)
+        allocations = _Allocations()
+        started = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            seconds = time.perf_counter() - started
+            allocated = allocations.stop()
+            with _lock:
+                stats = _stats.setdefault(name, CallStats())
+                stats.calls += 1
+                stats.seconds += seconds
+                stats.max_seconds = max(stats.max_seconds, seconds)
+                stats.last_seconds = seconds
+                stats.rows += getattr(_local, 'rows', 0) - rows
+                if allocated is not None:
+                    stats.allocated_bytes += allocated
+                    stats.traced_calls += 1
+
+    return wrapper
+
+
+def call_stats():
+    """
+    {function name: statistics} of every profiled function called so far.
+    """
+    with _lock:
+        return {name: stats.as_dict() for name, stats in sorted(_stats.items())}
+
+
+def reset():
+    with _lock:
+        _stats.clear()
+
+
+def prometheus_text():
+    """
+    The call statistics in the Prometheus text exposition format.
+    """
+    with _lock:
+        stats = sorted(_stats.items())
+    lines = []
+    for metric, kind, help_text, value in [
+        ('calls_total', 'counter', "Calls of the profiled function.", lambda s: s.calls),
+        ('call_seconds_total', 'counter', "Wall time spent in the profiled function.", lambda s: s.seconds),
+        ('call_seconds_max', 'gauge', "Slowest call of the profiled function.", lambda s: s.max_seconds),
+        ('rows_scanned_total', 'counter', "Incident and rollup rows read by the profiled function.",
+         lambda s: s.rows),
+        ('allocated_bytes_total', 'counter', "Peak memory allocated by traced calls, summed over the calls.",
+         lambda s: s.allocated_bytes),
+    ]:
+        lines.append(f"# HELP {METRIC_PREFIX}_{metric} {help_text}")
+        lines.append(f"# TYPE {METRIC_PREFIX}_{metric} {kind}")
+        lines += [f'{METRIC_PREFIX}_{metric}{{function="{name}"}} {value(s)}' for name, s in stats]
+    return '\n'.join(lines) + '\n'
+
+
+def export_prometheus(path=None, interval=PROMETHEUS_INTERVAL_SECONDS):
+    """
+    Write the call statistics to path (default: PROMETHEUS_FILE), at most once per interval seconds.
+
+    Called on every script run: a failed write is logged rather than raised into the page.
+    """
+    global _last_export
+    path = path or PROMETHEUS_FILE
+    if path is None:
+        return
+    with _lock:
+        now = time.monotonic()
+        if _last_export is not None and now - _last_export < interval:
+            return
+        _last_export = now
+
+    # Written to a temporary file of its own and renamed, so a collector never reads a partial file
+    temp_path = None
+    try:
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', prefix=os.path.basename(path) + '.',
+                                         suffix='.tmp')
+        with os.fdopen(fd, 'w') as file:
+            file.write(prometheus_text())
+        os.chmod(temp_path, 0o644)  # mkstemp makes it private; the collector may run as another user
+        os.replace(temp_path, path)
+    except OSError:
+        logger.exception("Exporting the call statistics to %s failed", path)
+        if temp_path is not None:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
@@ -0,0 +1,48 @@
+import multiprocessing
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def process_pool(workers, initializer=None, initargs=()):
+    """
+    Process pool of the command line tools: workers are forked from this process where
+    the platform allows it, so they share what it already loaded, and spawned elsewhere.
+    """
+    method = 'fork' if 'fork' in multiprocessing.get_all_start_methods() else 'spawn'
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(method),
+                               initializer=initializer, initargs=initargs)
+
+
+def import_statsmodels():
+    # Worker initializer: import statsmodels once per worker, outside the measured fits
+    import statsmodels.tsa.statespace.sarimax  # noqa: F401
+
+
+def peak_rss_bytes():
+    """
+    Highest resident memory of this process so far, or None where it is not reported.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def measured(function, *args):
+    """
+    Run function(*args) and return its result, wall seconds and the worker's peak RSS after it.
+
+    Nothing is traced while it runs, so the seconds are the function's own. The peak
+    RSS is the worker's high-water mark: it bounds the memory of the call but also
+    covers the calls the worker ran before.
+    """
+    started = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - started, peak_rss_bytes()